@@ -0,0 +1,95 @@
+"""Order timeframe score index by score
+
+Revision ID: 4b1e7d0c2a95
+Revises: 9f0cacf676fc
+Create Date: 2026-10-19 09:42:18.506117
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1e7d0c2a95'
+down_revision: Union[str, None] = '9f0cacf676fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+user = sa.table('user',
+    sa.column('id', sa.Integer),
+    sa.column('role', sa.Integer)
+)
+
+submission = sa.table('submission',
+    sa.column('user_id', sa.Integer),
+    sa.column('category', sa.String),
+    sa.column('chapter', sa.String),
+    sa.column('sub_chapter', sa.String),
+    sa.column('voided', sa.Boolean),
+    sa.column('rank', sa.Integer),
+    sa.column('date', sa.DateTime)
+)
+
+leaderboard = sa.table('leaderboard',
+    sa.column('category', sa.String),
+    sa.column('chapter', sa.String),
+    sa.column('sub_chapter', sa.String),
+    sa.column('total_submissions', sa.Integer)
+)
+
+timeframe_score = sa.table('timeframe_score',
+    sa.column('category', sa.String),
+    sa.column('time_frame', sa.String),
+    sa.column('user_id', sa.Integer),
+    sa.column('score', sa.Integer)
+)
+
+# Same boards and windows as routes.helpers.update_timeframe_scores
+TIMEFRAME_CATEGORIES = ('any%', 'inbounds', 'main board')
+TIME_FRAME_DAYS = {'all_time': None, 'monthly': 30, 'weekly': 7}
+
+
+def upgrade() -> None:
+    op.drop_index('ix_timeframe_score_board', table_name='timeframe_score')
+    op.create_index('ix_timeframe_score_board', 'timeframe_score',
+                    ['category', 'time_frame', sa.text('score DESC'), 'user_id'], unique=False)
+
+    # The user leaderboards now start from timeframe_score, verified users without rows would be missing from them
+    now = datetime.now()
+    for category in TIMEFRAME_CATEGORIES:
+        for time_frame, days in TIME_FRAME_DAYS.items():
+            # Points of a run are derived from its rank and the size of its board, like Submission.points
+            score = (
+                sa.select(sa.func.coalesce(sa.func.sum(leaderboard.c.total_submissions - submission.c.rank + 1), 0))
+                .where(submission.c.user_id == user.c.id, submission.c.voided == sa.false(),
+                       leaderboard.c.category == submission.c.category,
+                       leaderboard.c.chapter == submission.c.chapter,
+                       leaderboard.c.sub_chapter == submission.c.sub_chapter)
+            )
+            if category != 'main board':
+                score = score.where(submission.c.category == category)
+            if days is not None:
+                score = score.where(submission.c.date >= now - timedelta(days=days))
+
+            has_row = (
+                sa.select(timeframe_score.c.user_id)
+                .where(timeframe_score.c.user_id == user.c.id,
+                       timeframe_score.c.category == category,
+                       timeframe_score.c.time_frame == time_frame)
+                .exists()
+            )
+            missing_rows = (
+                sa.select(sa.literal(category), sa.literal(time_frame), user.c.id, score.scalar_subquery())
+                .where(user.c.role >= 1, ~has_row)
+            )
+            op.execute(timeframe_score.insert().from_select(['category', 'time_frame', 'user_id', 'score'],
+                                                            missing_rows))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timeframe_score_board', table_name='timeframe_score')
+    op.create_index('ix_timeframe_score_board', 'timeframe_score', ['category', 'time_frame', 'score'], unique=False)
@@ -0,0 +1,73 @@
+"""Derive submission points from board size
+
+Revision ID: 8bee4fc92b97
+Revises: 42b7cf356fa1
+Create Date: 2026-10-18 20:41:12.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8bee4fc92b97'
+down_revision: Union[str, None] = '42b7cf356fa1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+submission = sa.table('submission',
+    sa.column('category', sa.String),
+    sa.column('chapter', sa.String),
+    sa.column('sub_chapter', sa.String),
+    sa.column('voided', sa.Boolean),
+    sa.column('rank', sa.Integer),
+    sa.column('points', sa.Integer)
+)
+
+leaderboard = sa.table('leaderboard',
+    sa.column('category', sa.String),
+    sa.column('chapter', sa.String),
+    sa.column('sub_chapter', sa.String),
+    sa.column('total_submissions', sa.Integer)
+)
+
+
+def upgrade() -> None:
+    op.create_table('leaderboard',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=32), nullable=True),
+    sa.Column('chapter', sa.String(length=32), nullable=True),
+    sa.Column('sub_chapter', sa.String(length=32), nullable=True),
+    sa.Column('total_submissions', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('category', 'chapter', 'sub_chapter', name='uq_leaderboard_board')
+    )
+
+    board_sizes = (
+        sa.select(submission.c.category, submission.c.chapter, submission.c.sub_chapter, sa.func.count())
+        .where(submission.c.voided == sa.false())
+        .group_by(submission.c.category, submission.c.chapter, submission.c.sub_chapter)
+    )
+    op.execute(leaderboard.insert().from_select(['category', 'chapter', 'sub_chapter', 'total_submissions'],
+                                                board_sizes))
+
+    op.drop_column('submission', 'points')
+
+
+def downgrade() -> None:
+    op.add_column('submission', sa.Column('points', sa.Integer(), nullable=True))
+
+    board_points = (
+        sa.select(leaderboard.c.total_submissions - submission.c.rank + 1)
+        .where(leaderboard.c.category == submission.c.category,
+               leaderboard.c.chapter == submission.c.chapter,
+               leaderboard.c.sub_chapter == submission.c.sub_chapter)
+        .scalar_subquery()
+    )
+    # Voided runs are not counted in the board size, their stale rank would give them wrong or negative points
+    op.execute(submission.update().where(submission.c.voided == sa.false()).values(points=board_points))
+
+    op.drop_table('leaderboard')
@@ -0,0 +1,51 @@
+"""Store hashed token values
+
+Revision ID: befde0883dc1
+Revises: 5c8efca11cd6
+Create Date: 2026-10-18 22:51:03.446172
+
+"""
+from typing import Sequence, Union
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'befde0883dc1'
+down_revision: Union[str, None] = '5c8efca11cd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+token = sa.table('token',
+    sa.column('id', sa.Integer),
+    sa.column('access_token', sa.String),
+    sa.column('refresh_token', sa.String)
+)
+
+
+def _hash_token(raw_token):
+    return hashlib.sha256(raw_token.encode('utf-8')).hexdigest() if raw_token is not None else None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # Existing sessions stay valid: their raw tokens are replaced by the digests the lookups now compare against
+    for token_id, access_token, refresh_token in connection.execute(
+            sa.select(token.c.id, token.c.access_token, token.c.refresh_token)).all():
+        connection.execute(token.update().where(token.c.id == token_id)
+                           .values(access_token=_hash_token(access_token), refresh_token=_hash_token(refresh_token)))
+
+    op.create_index(op.f('ix_token_access_token'), 'token', ['access_token'], unique=True)
+    op.create_index(op.f('ix_token_refresh_token'), 'token', ['refresh_token'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_token_refresh_token'), table_name='token')
+    op.drop_index(op.f('ix_token_access_token'), table_name='token')
+
+    # The raw tokens can't be recovered from their digests, every user has to log in again
+    op.execute(token.delete())
@@ -1,12 +1,40 @@
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
 from highlight_scheduler import setup_highlight_scheduler
+from session import close_request_session
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """ JSON provider encoding responses with orjson. Types orjson can't encode natively fall back to Flask's default
+        conversions so the output matches the standard provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 load_dotenv('env_prod.env')
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 app.json.sort_keys = False
+app.teardown_appcontext(close_request_session)
 
 setup_highlight_scheduler()
 
@@ -14,7 +42,8 @@ testing_frontend_url = re.compile(r"http://localhost:.*")
 production_frontend_url = "https://ito.itt.run"
 
 CORS(app, resources=r"/api/*", supports_credentials=True, origins=[production_frontend_url, testing_frontend_url],
-     allow_headers=['Content-Type', 'Authorization', 'Set-Cookie', 'Cookie'], methods=['GET', 'POST', 'PUT', 'DELETE'])
+     allow_headers=['Content-Type', 'Authorization', 'Set-Cookie', 'Cookie', 'If-None-Match'], expose_headers=['ETag'],
+     methods=['GET', 'POST', 'PUT', 'DELETE'])
 
 from routes import helpers, ito_routes, auth_routes, account_routes, mod_routes, league_routes
 
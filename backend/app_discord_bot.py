@@ -1,57 +1,221 @@
 import asyncio
-from flask import Flask, request, jsonify
+import functools
+from collections import OrderedDict
+import os
+import time
+from aiohttp import web
 from dotenv import load_dotenv
 
-from discord_bot import get_record_notifier, get_bot_loop
+from discord_bot import get_record_notifier
 
 load_dotenv('env_prod.env')
 
-def create_app():
-    """Create and configure the Flask application"""
-    app = Flask(__name__)
+WEBHOOK_PORT = int(os.getenv('PORT', '10000'))
+# Records waiting to be posted, further webhooks are rejected with a 503 until some are delivered
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '100'))
+# Stays below the website's 30 second request timeout so it sees the delivery result
+WEBHOOK_DELIVERY_TIMEOUT = float(os.getenv('WEBHOOK_DELIVERY_TIMEOUT', '25'))
+# Number of record ids remembered to recognise records sent again after a timeout
+WEBHOOK_DELIVERY_MEMORY = int(os.getenv('WEBHOOK_DELIVERY_MEMORY', '1000'))
+
+
+class RecordDeliveryQueue:
+    """Bounded queue between the webhook and the RecordNotifier, drained by a single task on the bot's event loop.
+    Every record gets a future resolving to whether it was posted, which the webhook awaits before answering.
+    A record holds its slot until it is posted, so a stalled Discord connection fills the queue and further records
+    are rejected instead of piling up.
+    Records can carry an id (the website's outbox row id). A record sent again with the id of one that is still being
+    posted or was already posted gets that delivery's future instead of being posted twice."""
+
+    def __init__(self, maxsize: int = WEBHOOK_QUEUE_SIZE, memory: int = WEBHOOK_DELIVERY_MEMORY):
+        self.maxsize = maxsize
+        self.memory = memory
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.in_flight = 0
+        self.deliveries = OrderedDict()
+        self.task = None
+        self.stats = {
+            'received': 0,
+            'posted': 0,
+            'failed': 0,
+            'rejected': 0,
+            'duplicates': 0,
+            'last_error': None,
+            'last_delivery_ms': None,
+        }
+
+    def submit(self, record_data: dict, record_id: str = None):
+        """Queue a record, raises asyncio.QueueFull when maxsize records are waiting to be posted"""
+        if record_id is not None:
+            previous = self.deliveries.get(record_id)
+            if previous is not None and (not previous.done() or previous.result()):
+                self.stats['duplicates'] += 1
+                return previous
+
+        if self.in_flight >= self.maxsize:
+            self.stats['rejected'] += 1
+            raise asyncio.QueueFull()
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((record_data, future, time.perf_counter()))
+        self.in_flight += 1
+        self.stats['received'] += 1
+
+        if record_id is not None:
+            self.deliveries[record_id] = future
+            self.deliveries.move_to_end(record_id)
+            while len(self.deliveries) > self.memory:
+                self.deliveries.popitem(last=False)
+
+        return future
+
+    async def run(self):
+        """Hand queued records to the notifier without waiting for earlier ones to be posted, so records arriving
+        together share the notifier's coalescing window"""
+        while True:
+            record_data, future, received_at = await self.queue.get()
+
+            delivery = asyncio.ensure_future(self._deliver(record_data))
+            delivery.add_done_callback(functools.partial(self._delivered, future, received_at))
+
+    @staticmethod
+    async def _deliver(record_data: dict):
+        notifier = get_record_notifier()
+        if notifier is None:
+            raise RuntimeError('Discord bot not ready')
+        return await notifier.queue_record(record_data)
+
+    def _delivered(self, future, received_at, delivery):
+        self.in_flight -= 1
+        self.queue.task_done()
+
+        error = delivery.exception()
+        posted = error is None and delivery.result() is True
+        if posted:
+            self.stats['posted'] += 1
+        else:
+            self.stats['failed'] += 1
+            self.stats['last_error'] = str(error) if error else 'Posting to Discord failed'
+        self.stats['last_delivery_ms'] = round((time.perf_counter() - received_at) * 1000, 1)
+
+        if not future.done():
+            future.set_result(posted)
+
+    def status(self):
+        return dict(self.stats, queued=self.queue.qsize(), in_flight=self.in_flight, capacity=self.maxsize)
+
+
+def create_app(bot, delivery_queue: RecordDeliveryQueue):
+    """Create the aiohttp application serving the webhook on the bot's event loop"""
+    app = web.Application()
+
+    async def handle_new_record(request):
+        """Webhook endpoint to receive new record notifications, answers once the record was posted"""
+        try:
+            record_data = await request.json()
+        except ValueError:
+            record_data = None
+
+        if not record_data:
+            return web.json_response({'success': False, 'message': 'No data provided'}, status=400)
+
+        print(f"Received new record webhook: {record_data.get('username')} - "
+              f"{record_data.get('chapter')} {record_data.get('sub_chapter')}")
+
+        if not bot.is_ready() or get_record_notifier() is None:
+            return web.json_response({'success': False, 'message': 'Discord bot not ready'}, status=503)
+
+        try:
+            # Sending the record again with the same key after a 504 never posts it twice
+            delivery = delivery_queue.submit(record_data, request.headers.get('Idempotency-Key'))
+        except asyncio.QueueFull:
+            return web.json_response({'success': False, 'message': 'Record queue is full'}, status=503)
 
-    @app.route('/webhook/new-record', methods=['POST'])
-    def handle_new_record():
-        """Webhook endpoint to receive new record notifications"""
         try:
-            record_data = request.get_json()
+            posted = await asyncio.wait_for(asyncio.shield(delivery), WEBHOOK_DELIVERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            return web.json_response({'success': False, 'message': 'Record is still being posted'}, status=504)
+
+        if not posted:
+            return web.json_response({'success': False, 'message': 'Posting the record to Discord failed'}, status=502)
+
+        return web.json_response({'success': True, 'message': 'Record notification posted'}, status=200)
+
+    async def handle_new_records(request):
+        """Webhook endpoint receiving a batch of records as {"records": [{"id": ..., "record": {...}}, ...]}.
+        Every record is queued at once so they share announcement messages, the response maps each id to 'posted',
+        'failed' or 'pending' (still being posted when WEBHOOK_DELIVERY_TIMEOUT ran out, send it again later with the
+        same id to learn its result)."""
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+
+        records = body.get('records') if isinstance(body, dict) else None
+        if not records or not isinstance(records, list):
+            return web.json_response({'success': False, 'message': 'No records provided'}, status=400)
 
-            if not record_data:
-                return jsonify({'success': False, 'message': 'No data provided'}), 400
+        if not bot.is_ready() or get_record_notifier() is None:
+            return web.json_response({'success': False, 'message': 'Discord bot not ready'}, status=503)
 
-            print(f"Received new record webhook: {record_data.get('username')} - "
-                  f"{record_data.get('chapter')} {record_data.get('sub_chapter')}")
+        print(f"Received {len(records)} new record(s) webhook")
 
-            bot_loop = get_bot_loop()
-            record_notifier = get_record_notifier()
+        results = {}
+        deliveries = {}
+        for entry in records:
+            record_id = str(entry.get('id')) if isinstance(entry, dict) else None
+            record_data = entry.get('record') if isinstance(entry, dict) else None
+            if record_id is None or not record_data:
+                continue
 
-            if bot_loop and record_notifier:
-                asyncio.run_coroutine_threadsafe(
-                    record_notifier.post_new_record(record_data),
-                    bot_loop
-                )
-                return jsonify({'success': True, 'message': 'Record notification scheduled'}), 200
+            try:
+                deliveries[record_id] = delivery_queue.submit(record_data, record_id)
+            except asyncio.QueueFull:
+                results[record_id] = 'failed'
+
+        if deliveries:
+            await asyncio.wait(set(deliveries.values()), timeout=WEBHOOK_DELIVERY_TIMEOUT)
+
+        for record_id, delivery in deliveries.items():
+            if not delivery.done():
+                results[record_id] = 'pending'
             else:
-                return jsonify({'success': False, 'message': 'Discord bot not ready'}), 503
+                results[record_id] = 'posted' if delivery.result() else 'failed'
 
-        except Exception as e:
-            print(f"Webhook error: {e}")
-            return jsonify({'success': False, 'message': str(e)}), 500
+        return web.json_response({'success': True, 'message': 'Records processed', 'results': results}, status=200)
 
-    @app.route('/health', methods=['GET'])
-    def health_check():
-        """Health check endpoint"""
-        bot_loop = get_bot_loop()
-        record_notifier = get_record_notifier()
+    async def webhook_status(request):
+        """Delivery counters of the webhook queue"""
+        return web.json_response(delivery_queue.status(), status=200)
 
-        return jsonify({
+    async def health_check(request):
+        """Health check endpoint"""
+        return web.json_response({
             'status': 'healthy',
-            'discord_bot_ready': bot_loop is not None and record_notifier is not None
-        }), 200
+            'discord_bot_ready': bot.is_ready() and get_record_notifier() is not None
+        }, status=200)
 
-    @app.route('/', methods=['GET'])
-    def root():
+    async def root(request):
         """Root endpoint"""
-        return jsonify({'message': 'Discord Bot Webhook Server Running'}), 200
+        return web.json_response({'message': 'Discord Bot Webhook Server Running'}, status=200)
+
+    app.router.add_post('/webhook/new-record', handle_new_record)
+    app.router.add_post('/webhook/new-records', handle_new_records)
+    app.router.add_get('/webhook/status', webhook_status)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/', root)
+
+    return app
+
+
+async def start_webhook_server(bot, port: int = WEBHOOK_PORT):
+    """Start the webhook server and its delivery task on the running (bot) event loop"""
+    delivery_queue = RecordDeliveryQueue()
+    delivery_queue.task = asyncio.create_task(delivery_queue.run())
+
+    runner = web.AppRunner(create_app(bot, delivery_queue))
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
 
-    return app
\ No newline at end of file
+    print(f"Webhook server listening on port {port}")
+    return runner
@@ -0,0 +1,45 @@
+""" Latency of an authenticated request (/api/me) with the access-token cache hit, and with the cache emptied before
+    every request so each one looks the token and the user up in the database.
+
+        python benchmarks/auth_latency.py
+"""
+import os
+
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+
+from sqlalchemy import event
+
+from bench_env import app, create_session, get_engine, add_users, timings, summary
+from token_cache import token_cache
+
+REQUESTS = int(os.getenv('REQUESTS', '2000'))
+
+
+def main():
+    session = create_session()
+    add_users(session, 1000, password='password')
+    session.close()
+
+    client = app.test_client()
+    response = client.post('/api/tokens/create', auth=('runner0', 'password'))
+    headers = {'Authorization': f"Bearer {response.get_json()['data']['access_token']}"}
+
+    statements = []
+    event.listen(get_engine(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    def me_request():
+        assert client.get('/api/me', headers=headers).status_code == 200
+
+    def uncached_me_request():
+        token_cache.clear()
+        me_request()
+
+    for name, request in (('database lookup', uncached_me_request), ('cached token', me_request)):
+        me_request()
+        statements.clear()
+        durations = timings(request, REQUESTS)
+        print(f'{name:16} {summary(durations)}, {len(statements) / REQUESTS:.1f} queries per request')
+
+
+if __name__ == '__main__':
+    main()
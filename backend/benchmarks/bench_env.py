@@ -0,0 +1,85 @@
+""" Shared setup for the benchmark scripts. Importing it points the app at a throwaway SQLite database and keeps the
+    scheduler from starting, like tests/conftest.py does. Run the scripts from the backend directory, for example:
+
+        python benchmarks/login_storm.py
+"""
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_db_dir = tempfile.mkdtemp(prefix='ito-bench-')
+os.environ.setdefault('DB_STRING', f"sqlite:///{os.path.join(_db_dir, 'bench.db')}")
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-for-the-backend')
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import highlight_scheduler
+highlight_scheduler.setup_highlight_scheduler = lambda: None
+
+from app import app
+from models import User, Submission
+from routes.helpers import update_submission_rankings, update_player_scores
+from session import create_session, get_engine
+
+
+def add_users(session, count, password=None, prefix='runner'):
+    """ Adds count verified users, hashing the password once and sharing the hash. """
+
+    password_hash = None
+    if password is not None:
+        hashing_user = User()
+        hashing_user.generate_password_hash(password)
+        password_hash = hashing_user.password
+
+    users = [User(username=f'{prefix}{number}', email=f'{prefix}{number}@example.com', role=1, flag='us', lb_pref=3,
+                  score=0, creation_date=datetime.datetime.now(), password=password_hash)
+             for number in range(count)]
+    session.add_all(users)
+    session.commit()
+    return users
+
+
+def add_submissions(session, users, boards, runs_per_board, seed=1):
+    """ Adds runs_per_board runs from random users to every (category, chapter, sub_chapter) board and ranks them. """
+
+    generator = random.Random(seed)
+    now = datetime.datetime.now()
+
+    for category, chapter, sub_chapter in boards:
+        for user in generator.sample(users, min(runs_per_board, len(users))):
+            session.add(Submission(user_id=user.id, category=category, chapter=chapter, sub_chapter=sub_chapter,
+                                   time_complete=generator.randint(10000, 90000), game_title='itt',
+                                   video_url='https://example.com/run', voided=False, reported=False,
+                                   highlighted=False, date=now - datetime.timedelta(days=generator.randint(0, 40))))
+    session.commit()
+
+    for board in boards:
+        update_submission_rankings(session, *board)
+    update_player_scores(session)
+    session.commit()
+
+
+def timings(func, repeat):
+    """ Runs func repeat times and returns the durations in milliseconds. """
+
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def summary(durations):
+    """ Median, 95th percentile and max of durations in milliseconds, formatted for printing. """
+
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f'median {statistics.median(ordered):.2f} ms, p95 {p95:.2f} ms, max {ordered[-1]:.2f} ms'
+
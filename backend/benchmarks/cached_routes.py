@@ -0,0 +1,43 @@
+""" Latency of the cached public GET routes with the response cache warm, and with it emptied before every request so
+    each one is rebuilt from the database. Prints the cache's hit and miss counters for each run.
+
+        python benchmarks/cached_routes.py
+"""
+import os
+
+from bench_env import app, create_session, add_users, add_submissions, timings, summary
+from response_cache import response_cache
+
+USERS = int(os.getenv('USERS', '1000'))
+REQUESTS = int(os.getenv('REQUESTS', '300'))
+
+URLS = ['/api/leaderboard/itt/any/chapter0/sub0', '/api/leaderboard/recent_runs', '/api/leaderboard/users/total']
+
+
+def main():
+    session = create_session()
+    users = add_users(session, USERS)
+    boards = [('any%', f'chapter{chapter}', f'sub{sub_chapter}') for chapter in range(10) for sub_chapter in range(4)]
+    add_submissions(session, users, boards, runs_per_board=USERS // 4)
+    session.close()
+
+    client = app.test_client()
+    print(f'{USERS} verified users, {len(boards)} boards of {USERS // 4} runs, {REQUESTS} requests per url')
+
+    for url in URLS:
+        for name, clear_first in (('rebuilt', True), ('cached', False)):
+            def request():
+                if clear_first:
+                    response_cache.clear()
+                assert client.get(url).status_code == 200
+
+            request()
+            before = response_cache.stats()
+            durations = timings(request, REQUESTS)
+            after = response_cache.stats()
+            print(f'{url:42} {name:8} {summary(durations)}, '
+                  f"{after['hits'] - before['hits']} hits, {after['misses'] - before['misses']} misses")
+
+
+if __name__ == '__main__':
+    main()
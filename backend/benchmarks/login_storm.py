@@ -0,0 +1,71 @@
+""" Load test for the bcrypt password pool: times profile page requests while LOGIN_THREADS threads log in as fast as
+    they can, and reports how many logins were answered with 429. Uses the production cost factor unless BCRYPT_ROUNDS
+    is set. --inline checks passwords on the request threads instead, like before the pool existed.
+
+        python benchmarks/login_storm.py [--inline]
+"""
+import os
+import sys
+import threading
+
+os.environ.setdefault('BCRYPT_ROUNDS', '12')
+
+from bench_env import app, create_session, add_users, add_submissions, timings, summary
+import routes.auth_routes as auth_routes
+
+LOGIN_THREADS = int(os.getenv('LOGIN_THREADS', '32'))
+REQUESTS = int(os.getenv('REQUESTS', '200'))
+
+
+class InlinePasswordChecks:
+    """ Stand-in for the password pool running every check on the calling thread. """
+
+    def run(self, func, *args):
+        return func(*args)
+
+
+def main():
+    if '--inline' in sys.argv:
+        auth_routes.password_pool = InlinePasswordChecks()
+
+    session = create_session()
+    users = add_users(session, 50, password='password')
+    add_submissions(session, users, [('any%', f'chapter{number}', 'sub') for number in range(10)], runs_per_board=30)
+    session.close()
+
+    client = app.test_client()
+    app.logger.disabled = True
+    profile_statuses = []
+
+    def profile_request():
+        profile_statuses.append(client.get('/api/profile/runner1').status_code)
+
+    print(f'idle:        {summary(timings(profile_request, REQUESTS))}')
+    profile_statuses.clear()
+
+    stop = threading.Event()
+    login_statuses = []
+
+    def log_in_repeatedly():
+        login_client = app.test_client()
+        while not stop.is_set():
+            login_statuses.append(login_client.post('/api/tokens/create', auth=('runner0', 'password')).status_code)
+
+    storm = [threading.Thread(target=log_in_repeatedly) for _ in range(LOGIN_THREADS)]
+    for thread in storm:
+        thread.start()
+
+    try:
+        print(f'login storm: {summary(timings(profile_request, REQUESTS))}')
+    finally:
+        stop.set()
+        for thread in storm:
+            thread.join()
+
+    print(f'profile requests failed during the storm: {len(profile_statuses) - profile_statuses.count(200)}')
+    print(f'logins: {login_statuses.count(200)} accepted, {login_statuses.count(429)} rejected with 429, '
+          f'{len(login_statuses) - login_statuses.count(200) - login_statuses.count(429)} failed')
+
+
+if __name__ == '__main__':
+    main()
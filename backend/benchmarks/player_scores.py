@@ -0,0 +1,73 @@
+""" Cost of rescoring players after a run is added to one board, with thousands of verified users: the per-user loop
+    update_player_scores used to run on every submission, the incremental update of the board's runners, and the full
+    rebuild kept for repairs.
+
+        python benchmarks/player_scores.py
+"""
+import datetime
+import os
+
+from sqlalchemy import event
+
+from bench_env import create_session, get_engine, add_users, add_submissions, timings, summary
+from models import User, Submission
+from routes.helpers import update_submission_rankings, update_player_scores
+
+USERS = int(os.getenv('USERS', '5000'))
+REPEAT = int(os.getenv('REPEAT', '5'))
+
+
+def per_user_player_scores(session):
+    """ update_player_scores before it was incremental, lazy loading every verified user's runs. """
+
+    users = session.query(User).filter(User.role >= 1).all()
+
+    for user in users:
+        new_total_score = 0
+        for submission in user.submissions:
+            if submission.voided:
+                continue
+            new_total_score += submission.points
+        user.score = new_total_score
+
+    session.commit()
+
+
+def main():
+    session = create_session()
+    users = add_users(session, USERS)
+    boards = [(category, f'chapter{chapter}', f'sub{sub_chapter}') for category in ('any%', 'inbounds')
+              for chapter in range(10) for sub_chapter in range(4)]
+    add_submissions(session, users, boards, runs_per_board=USERS // 10)
+
+    board = boards[0]
+    runner_id = users[-1].id
+    statements = []
+    event.listen(get_engine(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    def add_run():
+        session.add(Submission(user_id=runner_id, category=board[0], chapter=board[1], sub_chapter=board[2],
+                               time_complete=10000, game_title='itt', video_url='https://example.com/run',
+                               voided=False, reported=False, highlighted=False, date=datetime.datetime.now()))
+        update_submission_rankings(session, *board, commit=False)
+
+    runs = session.query(Submission).filter(Submission.voided == False).count()
+    print(f'{USERS} verified users, {runs} runs on {len(boards)} boards')
+
+    for name, rescore in (('per user (before)', per_user_player_scores),
+                          ('incremental board', lambda session: update_player_scores(session, *board)),
+                          ('full rebuild', update_player_scores)):
+        def submit():
+            add_run()
+            rescore(session)
+            session.expunge_all()
+
+        statements.clear()
+        durations = timings(submit, REPEAT)
+        print(f'{name:18} {summary(durations)}, {len(statements) / REPEAT:.0f} statements per submission')
+
+    session.close()
+
+
+if __name__ == '__main__':
+    main()
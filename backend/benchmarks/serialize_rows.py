@@ -0,0 +1,90 @@
+""" Per-row cost of serializing a leaderboard of 10k submissions: the __dict__ walk the serializers used before the
+    precompiled schemas, ModelSerializer on ORM objects, and row tuples from query_submission_rows. Times the
+    serialization alone on already loaded objects, then the query plus serialization, then the JSON encoding of the
+    result with Flask's default provider and with app.json (orjson when it is installed).
+
+        python benchmarks/serialize_rows.py
+"""
+import datetime
+import os
+import statistics
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import joinedload
+
+from bench_env import app, create_session, add_users, add_submissions, timings, summary
+from models import Submission
+from serializers import convert_int_to_time, get_submission_entry, query_submission_rows, get_submission_row_entry
+
+SUBMISSIONS = int(os.getenv('SUBMISSIONS', '10000'))
+REPEAT = int(os.getenv('REPEAT', '10'))
+
+
+def dict_walk_submission_entry(single_entry):
+    """ get_submission_entry before the precompiled schemas, checking the type of every attribute of every row. """
+
+    if single_entry is None:
+        return None
+    single_record = {}
+    for i, j in single_entry.__dict__.items():
+        if not i.startswith('_'):
+            if isinstance(j, datetime.datetime):
+                single_record[i] = j.timestamp()
+            elif i == 'user':
+                single_record[i] = single_entry.user.username
+            elif i == 'time_complete':
+                single_record[i] = convert_int_to_time(j)
+            else:
+                single_record[i] = j
+    return single_record
+
+
+def per_row(durations):
+    """ Median duration in microseconds per submission. """
+
+    return f'{statistics.median(durations) * 1000 / SUBMISSIONS:6.2f} us/row'
+
+
+def main():
+    session = create_session()
+    users = add_users(session, 1000)
+    add_submissions(session, users, [('any%', 'chapter', f'sub{number}') for number in range(SUBMISSIONS // 1000)],
+                    runs_per_board=1000)
+    session.close()
+
+    def query_objects():
+        return session.query(Submission).options(joinedload(Submission.user)).all()
+
+    def query_rows():
+        return query_submission_rows(session).all()
+
+    session = create_session()
+    submissions = query_objects()
+    print(f'{len(submissions)} submissions, median of {REPEAT} runs')
+
+    for name, serialize in (('__dict__ walk', dict_walk_submission_entry), ('ModelSerializer', get_submission_entry)):
+        durations = timings(lambda: [serialize(submission) for submission in submissions], REPEAT)
+        print(f'serialize loaded objects, {name:17} {per_row(durations)}  ({summary(durations)})')
+
+    for name, load_and_serialize in (
+            ('__dict__ walk', lambda: [dict_walk_submission_entry(submission) for submission in query_objects()]),
+            ('ModelSerializer', lambda: [get_submission_entry(submission) for submission in query_objects()]),
+            ('row tuples', lambda: [get_submission_row_entry(row) for row in query_rows()])):
+        def run():
+            load_and_serialize()
+            session.expunge_all()
+
+        durations = timings(run, REPEAT)
+        print(f'query and serialize,      {name:17} {per_row(durations)}  ({summary(durations)})')
+
+    data = [get_submission_row_entry(row) for row in query_rows()]
+    with app.app_context():
+        for provider in (DefaultJSONProvider(app), app.json):
+            durations = timings(lambda: provider.dumps(data), REPEAT)
+            print(f'encode JSON,              {type(provider).__name__:17} {per_row(durations)}  ({summary(durations)})')
+
+    session.close()
+
+
+if __name__ == '__main__':
+    main()
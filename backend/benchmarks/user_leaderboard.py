@@ -0,0 +1,103 @@
+""" Requests per second of the user leaderboards (/api/leaderboard/users/<category>/<time_frame>), served from the
+    timeframe_score board index, against the previous query that started from every verified user and outer joined
+    their scores. Also times the nine grouped score queries of a full timeframe score rebuild with and without the list
+    of every verified user id.
+
+        python benchmarks/user_leaderboard.py
+"""
+import os
+import time
+
+from flask import request
+from sqlalchemy import and_, func, or_
+
+from bench_env import app, create_session, add_users, add_submissions, timings, summary
+from models import User, TimeframeScore
+from routes.helpers import (ito_api_response, conditional_response, calculate_timeframe_scores, TIMEFRAME_CATEGORIES,
+                            TIME_FRAMES)
+from serializers import get_single_entry
+from session import db_session
+
+USERS = int(os.getenv('USERS', '5000'))
+REQUESTS = int(os.getenv('REQUESTS', '200'))
+
+
+@conditional_response(counters=lambda category, time_frame: ['scores', 'timeframe_scores', 'users'])
+@db_session
+def outer_join_user_leaderboard(session, category, time_frame):
+    """ The route before it read the board index, ranking every verified user's coalesced score. """
+
+    if category == "any":
+        category = "any%"
+        category_filter = or_(User.lb_pref == 1, User.lb_pref == 3)
+    else:
+        category = "main board"
+        category_filter = or_()
+
+    timeframe_score = func.coalesce(TimeframeScore.score, 0)
+    leaderboard_query = (
+        session.query(User, timeframe_score)
+        .outerjoin(TimeframeScore, and_(TimeframeScore.user_id == User.id,
+                                        TimeframeScore.category == category,
+                                        TimeframeScore.time_frame == time_frame))
+        .filter(User.role >= 1)
+        .filter(category_filter)
+        .order_by(timeframe_score.desc(), User.id.asc())
+    )
+
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('per_page', type=int)
+    if page and per_page and page > 0 and per_page > 0:
+        leaderboard_query = leaderboard_query.offset((page - 1) * per_page).limit(per_page)
+
+    response_data = []
+    for user, user_timeframe_score in leaderboard_query.all():
+        user_data = get_single_entry(user)
+        user_data['timeframe_score'] = user_timeframe_score
+        response_data.append(user_data)
+
+    return ito_api_response(success=True, message="Successfully retrieved user leaderboard", data=response_data,
+                            status_code=200)
+
+
+def requests_per_second(client, url):
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.get(url).status_code == 200
+    return REQUESTS / (time.perf_counter() - started)
+
+
+def main():
+    session = create_session()
+    users = add_users(session, USERS)
+    boards = [(category, f'chapter{chapter}', f'sub{sub_chapter}') for category in ('any%', 'inbounds')
+              for chapter in range(10) for sub_chapter in range(4)]
+    add_submissions(session, users, boards, runs_per_board=USERS // 10)
+
+    verified_user_ids = [user_id for user_id, in session.query(User.id).filter(User.role >= 1)]
+
+    for name, user_ids in (('with every user id', verified_user_ids), ('grouped over all users', None)):
+        def rebuild_scores():
+            for category in TIMEFRAME_CATEGORIES:
+                for time_frame in TIME_FRAMES:
+                    calculate_timeframe_scores(session, user_ids, time_frame, category)
+
+        print(f'full rebuild score queries, {name}: {summary(timings(rebuild_scores, 5))}')
+    session.close()
+
+    client = app.test_client()
+    urls = ['/api/leaderboard/users/any/weekly?page=1&per_page=50', '/api/leaderboard/users/any/all_time']
+    route = app.view_functions['get_user_leaderboard_data']
+
+    print(f'{USERS} verified users, {REQUESTS} requests per url')
+    for name, view in (('outer join from users', outer_join_user_leaderboard), ('timeframe_score index', route)):
+        app.view_functions['get_user_leaderboard_data'] = view
+        for url in urls:
+            client.get(url)
+            print(f'{name:22} {url:55} {requests_per_second(client, url):8.1f} requests/sec')
+
+    app.view_functions['get_user_leaderboard_data'] = route
+
+
+if __name__ == '__main__':
+    main()
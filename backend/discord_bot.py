@@ -1,6 +1,5 @@
 import os
 import asyncio
-import threading
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
@@ -11,6 +10,10 @@ load_dotenv('env_prod.env')
 BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 DISCORD_FORUM_CHANNEL_ID = int(os.getenv('DISCORD_FORUM_CHANNEL_ID', '0'))
 DISCORD_THREAD_ID = int(os.getenv('DISCORD_THREAD_ID', '0'))
+# Seconds records wait for others to share their announcement message, 0 posts every record on its own
+DISCORD_COALESCE_SECONDS = float(os.getenv('DISCORD_COALESCE_SECONDS', '2'))
+# Discord accepts at most 10 embeds per message
+MAX_EMBEDS_PER_MESSAGE = 10
 
 # OLD TEST CHANNEL DATA
 # DISCORD_FORUM_CHANNEL_ID = 1068757629637234748
@@ -21,20 +24,145 @@ _record_notifier = None
 _bot_loop = None
 
 
+def build_record_embed(record_data: dict):
+    """Build the announcement embed for a new or tied record"""
+    username = record_data.get('username', 'Unknown Player')
+    chapter = record_data.get('chapter', '').replace('_', ' ').title()
+    sub_chapter = record_data.get('sub_chapter', '').replace('_', ' ').title()
+    category = record_data.get('category', '').replace('_', ' ').title()
+    time_str = record_data.get('time_complete', 'Unknown Time')
+    video_url = record_data.get('video_url', '')
+    improvement_ms = record_data.get('improvement_ms')
+
+    print("Improvement", improvement_ms)
+
+    if improvement_ms == 0:
+        embed = discord.Embed(
+            title="🏆 RECORD TIED! 🏆",
+            description=f"**{username}** has tied the current record!",
+            color=discord.Color.gold(),
+            timestamp=datetime.now()
+        )
+    else:
+        embed = discord.Embed(
+            title="🏆 NEW RECORD SET! 🏆",
+            description=f"**{username}** has set a new record!",
+            color=discord.Color.gold(),
+            timestamp=datetime.now()
+        )
+
+    embed.add_field(
+        name="Map",
+        value=f"{chapter}\n{sub_chapter}",
+        inline=True
+    )
+
+    embed.add_field(
+        name="Category",
+        value=category,
+        inline=True
+    )
+
+    embed.add_field(
+        name="New Time",
+        value=f"**{time_str}**",
+        inline=True
+    )
+
+    if improvement_ms and improvement_ms > 0:
+        improvement_seconds = improvement_ms / 1000
+        embed.add_field(
+            name="📈 Improvement",
+            value=f"**-{improvement_seconds:.3f}s**",
+            inline=True
+        )
+
+    if video_url:
+        embed.add_field(
+            name="Video",
+            value=f"[Watch Run]({video_url})",
+            inline=False
+        )
+
+    embed.set_footer(text="ITO Speedrun Records")
+
+    return embed
+
+
 class RecordNotifier:
-    def __init__(self, bot):
-        self.bot = bot
+    """Posts record announcements. Records queued for the same thread within coalesce_seconds of each other are sent
+    together, up to MAX_EMBEDS_PER_MESSAGE embeds per message. The forum channel and threads are looked up once and
+    reused across calls."""
 
-    async def post_new_record(self, record_data: dict, thread_id: int = DISCORD_THREAD_ID):
-        """Post a new record announcement to an existing forum thread or create a new one"""
-        try:
+    def __init__(self, bot, coalesce_seconds: float = DISCORD_COALESCE_SECONDS):
+        self.bot = bot
+        self.coalesce_seconds = coalesce_seconds
+        self._channel = None
+        self._threads = {}
+        self._pending = {}
+        self._flush_tasks = {}
+
+    def get_forum_channel(self):
+        """Return the cached forum channel, or None if it can't be found"""
+        if self._channel is None:
             channel = self.bot.get_channel(DISCORD_FORUM_CHANNEL_ID)
             if not channel:
                 print(f"Could not find forum channel with ID: {DISCORD_FORUM_CHANNEL_ID}")
-                return False
+                return None
 
             if not isinstance(channel, discord.ForumChannel):
                 print(f"Channel {DISCORD_FORUM_CHANNEL_ID} is not a forum channel")
+                return None
+
+            self._channel = channel
+
+        return self._channel
+
+    async def get_thread(self, thread_id: int):
+        """Return the cached thread, fetching it from Discord the first time"""
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            thread = self.bot.get_channel(thread_id)
+            if not thread:
+                thread = await self.bot.fetch_channel(thread_id)
+
+            if not thread or not isinstance(thread, discord.Thread):
+                print(f"Could not find thread with ID: {thread_id}")
+                return None
+
+            self._threads[thread_id] = thread
+
+        return thread
+
+    async def send_embeds(self, embeds: list, thread_id: int = DISCORD_THREAD_ID):
+        """Send up to MAX_EMBEDS_PER_MESSAGE embeds to an existing forum thread in a single message"""
+        try:
+            if not self.get_forum_channel():
+                return False
+
+            thread = await self.get_thread(thread_id)
+            if not thread:
+                return False
+
+            await thread.send(embeds=embeds)
+            print(f"Successfully posted {len(embeds)} record(s) to existing thread: {thread.name}")
+            return True
+        except Exception as e:
+            # The thread may have been deleted or archived, look it up again next time
+            self._threads.pop(thread_id, None)
+            print(f"Error posting to existing thread {thread_id}: {e}")
+            return False
+
+    async def post_new_record(self, record_data: dict, thread_id: int = DISCORD_THREAD_ID):
+        """Post a new record announcement to an existing forum thread or create a new one"""
+        try:
+            embed = build_record_embed(record_data)
+
+            if thread_id:
+                return await self.send_embeds([embed], thread_id)
+
+            channel = self.get_forum_channel()
+            if not channel:
                 return False
 
             username = record_data.get('username', 'Unknown Player')
@@ -42,93 +170,53 @@ class RecordNotifier:
             sub_chapter = record_data.get('sub_chapter', '').replace('_', ' ').title()
             category = record_data.get('category', '').replace('_', ' ').title()
             time_str = record_data.get('time_complete', 'Unknown Time')
-            video_url = record_data.get('video_url', '')
-            improvement_ms = record_data.get('improvement_ms')
-
-            print("Improvement", improvement_ms)
-
-            if improvement_ms == 0:
-                embed = discord.Embed(
-                    title="🏆 RECORD TIED! 🏆",
-                    description=f"**{username}** has tied the current record!",
-                    color=discord.Color.gold(),
-                    timestamp=datetime.now()
-                )
-            else:
-                embed = discord.Embed(
-                    title="🏆 NEW RECORD SET! 🏆",
-                    description=f"**{username}** has set a new record!",
-                    color=discord.Color.gold(),
-                    timestamp=datetime.now()
-                )
-
-            embed.add_field(
-                name="Map",
-                value=f"{chapter}\n{sub_chapter}",
-                inline=True
-            )
 
-            embed.add_field(
-                name="Category",
-                value=category,
-                inline=True
-            )
+            forum_title = f"🏆 {username} - {chapter} {sub_chapter} ({category}) - {time_str}"
 
-            embed.add_field(
-                name="New Time",
-                value=f"**{time_str}**",
-                inline=True
+            thread = await channel.create_thread(
+                name=forum_title[:100],
+                embed=embed,
+                reason="New speedrun record"
             )
 
-            if improvement_ms and improvement_ms > 0:
-                improvement_seconds = improvement_ms / 1000
-                embed.add_field(
-                    name="📈 Improvement",
-                    value=f"**-{improvement_seconds:.3f}s**",
-                    inline=True
-                )
-
-            if video_url:
-                embed.add_field(
-                    name="Video",
-                    value=f"[Watch Run]({video_url})",
-                    inline=False
-                )
-
-            embed.set_footer(text="ITO Speedrun Records")
-
-            if thread_id:
-                try:
-                    thread = self.bot.get_channel(thread_id)
-                    if not thread:
-                        thread = await self.bot.fetch_channel(thread_id)
-
-                    if thread and isinstance(thread, discord.Thread):
-                        await thread.send(embed=embed)
-                        print(f"Successfully posted to existing thread: {thread.name}")
-                        return True
-                    else:
-                        print(f"Could not find thread with ID: {thread_id}")
-                        return False
-                except Exception as e:
-                    print(f"Error posting to existing thread {thread_id}: {e}")
-                    return False
-            else:
-                forum_title = f"🏆 {username} - {chapter} {sub_chapter} ({category}) - {time_str}"
-
-                thread = await channel.create_thread(
-                    name=forum_title[:100],
-                    embed=embed,
-                    reason="New speedrun record"
-                )
-
-                print(f"Successfully created new thread: {thread.thread.name}")
-                return True
+            print(f"Successfully created new thread: {thread.thread.name}")
+            return True
 
         except Exception as e:
             print(f"Error posting to Discord: {e}")
             return False
 
+    def queue_record(self, record_data: dict, thread_id: int = DISCORD_THREAD_ID):
+        """Queue a record announcement, must be called from the bot's event loop.
+        Returns a future resolving to True once the message containing the record was posted."""
+        loop = asyncio.get_running_loop()
+
+        if not thread_id or self.coalesce_seconds <= 0:
+            # Records creating their own forum thread can't share a message
+            return loop.create_task(self.post_new_record(record_data, thread_id))
+
+        future = loop.create_future()
+        self._pending.setdefault(thread_id, []).append((build_record_embed(record_data), future))
+
+        if thread_id not in self._flush_tasks:
+            self._flush_tasks[thread_id] = loop.create_task(self._flush_after_window(thread_id))
+
+        return future
+
+    async def _flush_after_window(self, thread_id: int):
+        await asyncio.sleep(self.coalesce_seconds)
+
+        del self._flush_tasks[thread_id]
+        pending = self._pending.pop(thread_id, [])
+
+        for start in range(0, len(pending), MAX_EMBEDS_PER_MESSAGE):
+            batch = pending[start:start + MAX_EMBEDS_PER_MESSAGE]
+            posted = await self.send_embeds([embed for embed, _ in batch], thread_id)
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(posted)
+
 
 def create_bot():
     """Create and configure the Discord bot"""
@@ -138,6 +226,13 @@ def create_bot():
 
     bot = commands.Bot(command_prefix='&', intents=intents)
 
+    async def setup_hook():
+        # The webhook server shares the bot's event loop, imported here as it imports this module
+        from app_discord_bot import start_webhook_server
+        await start_webhook_server(bot)
+
+    bot.setup_hook = setup_hook
+
     @bot.event
     async def on_ready():
         global _record_notifier, _bot_loop
@@ -145,13 +240,15 @@ def create_bot():
         print(f"Forum channel ID: {DISCORD_FORUM_CHANNEL_ID}")
 
         _bot_loop = asyncio.get_event_loop()
-        _record_notifier = RecordNotifier(bot)
+        # on_ready fires again after reconnects, keep the notifier and its cached channel and threads
+        if _record_notifier is None:
+            _record_notifier = RecordNotifier(bot)
 
     return bot
 
 
 def run_discord_bot():
-    """Run the Discord bot in its own thread"""
+    """Run the Discord bot and its webhook server until the process stops"""
     global _bot
 
     print("Starting Discord bot...")
@@ -161,9 +258,6 @@ def run_discord_bot():
         return
 
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
         _bot = create_bot()
         _bot.run(BOT_TOKEN)
     except Exception as e:
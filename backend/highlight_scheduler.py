@@ -1,62 +1,254 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
-from models import Submission
-from session import db_session
+from apscheduler.triggers.interval import IntervalTrigger
+from datetime import datetime, time, timedelta
+from models import Submission, Token, HighlightSnapshot
+from routes.helpers import (update_timeframe_scores, bump_versions, dispatch_discord_outbox, acquire_lease,
+                            build_highlight_snapshot, HIGHLIGHT_SNAPSHOT_ID)
+from session import db_session, create_session
+import functools
+import os
 import pytz
-from sqlalchemy import func
+import random
+import socket
+import threading
 
+# Every worker runs the scheduler, but only the holder of this lease runs the jobs. send_discord_notifications runs
+# every 15 seconds and renews it, another worker takes over within SCHEDULER_LEASE_SECONDS if the holder dies.
+SCHEDULER_LEASE_NAME = 'scheduled_jobs'
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', '60'))
+
+# Highlights rotate daily at 12:59 PM EST
+ROTATION_TIMEZONE = pytz.timezone('US/Eastern')
+ROTATION_TIME = time(12, 59)
+
+# The cron job and a catch-up from refresh_timeframe_scores run on different scheduler threads
+_rotation_lock = threading.Lock()
+
+
+def leader_only(job):
+    """
+    Decorator running the job only in the process holding the scheduler lease.
+    """
+    @functools.wraps(job)
+    def leader_job(*args, **kwargs):
+        # Computed per call as gunicorn forks workers after this module is imported
+        holder = f"{socket.gethostname()}:{os.getpid()}"
+
+        session = create_session()
+        try:
+            is_leader = acquire_lease(session, SCHEDULER_LEASE_NAME, holder, SCHEDULER_LEASE_SECONDS)
+        except Exception as error:
+            print(f"Error acquiring scheduler lease: {error}")
+            return None
+        finally:
+            session.close()
+
+        if is_leader:
+            return job(*args, **kwargs)
+        return None
+
+    return leader_job
+
+
+def last_scheduled_rotation(now=None):
+    """
+    Most recent daily rotation time at or before now, as a naive local datetime
+    like the timestamps stored in the database.
+    """
+    now = now or datetime.now(ROTATION_TIMEZONE)
+    now = now.astimezone(ROTATION_TIMEZONE)
+
+    rotation_date = now.date()
+    if now.time() < ROTATION_TIME:
+        rotation_date -= timedelta(days=1)
+
+    scheduled = ROTATION_TIMEZONE.localize(datetime.combine(rotation_date, ROTATION_TIME))
+    return scheduled.astimezone().replace(tzinfo=None)
+
+
+def rotate_highlights_if_due(session):
+    """
+    Rotates the highlighted submissions unless they were already rotated since
+    the last scheduled rotation time, so a rotation missed while the scheduler
+    lease changed hands runs once as soon as a job of the new leader runs.
+    Before any rotation was recorded (a new database, or right after the
+    rotated_at column was added) the current highlights count as the last
+    scheduled rotation's, so starting the app never rotates them.
+    - Sets highlighted=False for all currently highlighted submissions
+    - Selects 3 random submissions with rank=1 and sets them to highlighted=True
+    Returns whether the highlights were rotated.
+    """
+    with _rotation_lock:
+        rotated_at = session.query(HighlightSnapshot.rotated_at) \
+            .filter(HighlightSnapshot.id == HIGHLIGHT_SNAPSHOT_ID) \
+            .scalar()
+
+        if rotated_at is None:
+            if session.get(HighlightSnapshot, HIGHLIGHT_SNAPSHOT_ID) is None:
+                build_highlight_snapshot(session)
+            session.get(HighlightSnapshot, HIGHLIGHT_SNAPSHOT_ID).rotated_at = last_scheduled_rotation()
+            session.commit()
+            return False
+
+        if rotated_at >= last_scheduled_rotation():
+            return False
+
+        session.query(Submission) \
+            .filter(Submission.highlighted == True) \
+            .update({Submission.highlighted: False}, synchronize_session=False)
+
+        # Only ids are read, from the (rank, voided) index, and sampled here instead of sorting every row by random()
+        first_place_ids = [submission_id for submission_id, in session.query(Submission.id)
+                           .filter(Submission.rank == 1, Submission.voided == False)]
+
+        new_highlight_ids = random.sample(first_place_ids, min(3, len(first_place_ids)))
+
+        if len(new_highlight_ids) < 3:
+            print(f"Warning: Only found {len(new_highlight_ids)} submissions with rank=1")
+
+        if new_highlight_ids:
+            session.query(Submission) \
+                .filter(Submission.id.in_(new_highlight_ids)) \
+                .update({Submission.highlighted: True}, synchronize_session=False)
+
+        build_highlight_snapshot(session, rotated=True)
+        session.commit()
+
+        print(f"Highlighted submissions rotated at {datetime.now(ROTATION_TIMEZONE)}")
+        print(f"New highlighted submission IDs: {new_highlight_ids}")
+
+        return True
+
+
+@leader_only
 @db_session
 def rotate_highlighted_submissions(session):
     """
     Function to rotate highlighted submissions daily at 12:59 PM EST.
-    - Sets highlighted=False for all currently highlighted submissions
-    - Selects 3 random submissions with rank=1 and sets them to highlighted=True
     """
     try:
-        currently_highlighted = session.query(Submission).filter(Submission.highlighted == True).all()
-        for submission in currently_highlighted:
-            submission.highlighted = False
-
-        new_highlights = session.query(Submission) \
-            .filter(Submission.rank == 1, Submission.voided == False) \
-            .order_by(func.random()) \
-            .limit(3) \
-            .all()
+        rotate_highlights_if_due(session)
 
-        if len(new_highlights) < 3:
-            print(f"Warning: Only found {len(new_highlights)} submissions with rank=1")
+    except Exception as error:
+        print(f"Error rotating highlighted submissions: {error}")
 
-        for submission in new_highlights:
-            submission.highlighted = True
 
+@leader_only
+@db_session
+def refresh_timeframe_scores(session):
+    """
+    Function to rebuild the monthly and weekly user leaderboards so runs drop out of
+    the rolling windows as they age. Submission changes refresh the affected users
+    immediately, this only catches expiry.
+    It also runs a highlight rotation that was missed because the previous
+    scheduler leader stopped around 12:59 PM EST.
+    """
+    try:
+        if update_timeframe_scores(session):
+            bump_versions(session, 'timeframe_scores')
         session.commit()
 
-        print(f"Highlighted submissions rotated at {datetime.now(pytz.timezone('US/Eastern'))}")
-        print(f"New highlighted submission IDs: {[s.id for s in new_highlights]}")
+        print(f"Timeframe scores refreshed at {datetime.now(ROTATION_TIMEZONE)}")
+
+    except Exception as error:
+        print(f"Error refreshing timeframe scores: {error}")
+
+    try:
+        if rotate_highlights_if_due(session):
+            print("Ran a missed highlight rotation")
 
     except Exception as error:
+        session.rollback()
         print(f"Error rotating highlighted submissions: {error}")
 
 
+@leader_only
+@db_session
+def send_discord_notifications(session):
+    """
+    Function to post queued record notifications to the Discord bot.
+    """
+    try:
+        sent, failed = dispatch_discord_outbox(session)
+
+        if sent or failed:
+            print(f"Discord outbox sent {sent} notifications, {failed} failed")
+
+    except Exception as error:
+        print(f"Error sending Discord notifications: {error}")
+
+
+# Totals since the worker started, printed after every sweep
+token_sweep_stats = {'runs': 0, 'rows_removed': 0, 'last_rows_removed': 0}
+
+
+@leader_only
+@db_session
+def sweep_expired_tokens(session):
+    """
+    Function to delete tokens whose refresh token expired more than a day ago,
+    in batches, so logins never pay for the cleanup.
+    """
+    try:
+        removed = Token.clear_old_tokens(session)
+
+        token_sweep_stats['runs'] += 1
+        token_sweep_stats['rows_removed'] += removed
+        token_sweep_stats['last_rows_removed'] = removed
+
+        print(f"Expired token sweep removed {removed} tokens ({token_sweep_stats['rows_removed']} total) at "
+              f"{datetime.now(pytz.timezone('US/Eastern'))}")
+
+    except Exception as error:
+        print(f"Error sweeping expired tokens: {error}")
+
+
 def setup_highlight_scheduler():
     """
     Set up the scheduler to run the rotate_highlighted_submissions function
-    every day at 12:59 PM EST.
+    every day at 12:59 PM EST, refresh_timeframe_scores every 15 minutes,
+    starting immediately, sweep_expired_tokens every hour and
+    send_discord_notifications every 15 seconds.
     """
     scheduler = BackgroundScheduler()
 
     scheduler.add_job(
         rotate_highlighted_submissions,
         trigger=CronTrigger(
-            hour=12,
-            minute=59,
-            timezone=pytz.timezone('US/Eastern')
+            hour=ROTATION_TIME.hour,
+            minute=ROTATION_TIME.minute,
+            timezone=ROTATION_TIMEZONE
         ),
         id='rotate_highlighted_submissions',
         name='Rotate highlighted submissions daily',
         replace_existing=True
     )
 
+    scheduler.add_job(
+        refresh_timeframe_scores,
+        trigger=IntervalTrigger(minutes=15),
+        id='refresh_timeframe_scores',
+        name='Refresh rolling timeframe leaderboards',
+        next_run_time=datetime.now(),
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        sweep_expired_tokens,
+        trigger=IntervalTrigger(hours=1),
+        id='sweep_expired_tokens',
+        name='Delete expired tokens in batches',
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        send_discord_notifications,
+        trigger=IntervalTrigger(seconds=15),
+        id='send_discord_notifications',
+        name='Post queued Discord record notifications',
+        replace_existing=True
+    )
+
     scheduler.start()
     print("Highlight rotation scheduler started")
\ No newline at end of file
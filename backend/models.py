@@ -1,13 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Table
-from sqlalchemy.orm import relationship, declarative_base, backref
+from sqlalchemy import (Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Table, UniqueConstraint, Index,
+                        select, case, null, text)
+from sqlalchemy.orm import relationship, declarative_base, backref, column_property
 from flask import jsonify, make_response
 import jwt
 import os
 import datetime
+import hashlib
+import hmac
 import bcrypt
 from bcrypt import hashpw, checkpw
 
 API_KEY = os.environ.get("SECRET_KEY")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
 Base = declarative_base()
 
 user_badges = Table('user_badges', Base.metadata,
@@ -23,7 +27,7 @@ class User(Base):
     email = Column(String(120), index=True, unique=True)
     password = Column(String(150))
     creation_date = Column(DateTime)
-    score = Column(Integer)
+    score = Column(Integer, index=True)
     submissions = relationship('Submission', foreign_keys='Submission.user_id', backref='user')
     badges = relationship('Badge', secondary=user_badges, back_populates='users')
     league_runs = relationship('LeagueRun', foreign_keys='LeagueRun.user_id', backref='user')
@@ -40,7 +44,7 @@ class User(Base):
         :return binary: binary encoding of characters representing the user's password as a hash
         """
 
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hash_password = hashpw(password.encode('utf-8'), salt).decode('utf-8')
         self.password = hash_password
 
@@ -53,22 +57,52 @@ class User(Base):
 
         return checkpw(entered_password.encode(encoding='utf-8', errors='strict'), bytes(self.password, 'utf-8'))
 
+    def password_needs_rehash(self):
+        """ Checks whether the stored hash was made with a different cost factor than BCRYPT_ROUNDS
+
+        :return boolean: True if the password should be hashed again the next time it is entered
+        """
+
+        # bcrypt hashes are formatted $2b$<cost>$<salt and hash>
+        try:
+            return int(self.password.split('$')[2]) != BCRYPT_ROUNDS
+        except (AttributeError, IndexError, ValueError):
+            return False
+
 class Token(Base):
     __tablename__ = 'token'
     id = Column(Integer, primary_key=True)
-    access_token = Column(String(64))
+    # Only the sha256 hex digests of the tokens are stored, the raw tokens are handed to the client inside the JWTs
+    access_token = Column(String(64), index=True, unique=True)
     access_expiration = Column(DateTime)
-    refresh_token = Column(String(64))
-    refresh_expiration = Column(DateTime)
+    refresh_token = Column(String(64), index=True, unique=True)
+    refresh_expiration = Column(DateTime, index=True)
     user = Column(Integer, ForeignKey('user.id'))
 
-    def create_token_response(self):
+    @staticmethod
+    def hash_token(raw_token):
+        """ Fixed width digest stored in place of a raw access or refresh token
+
+        :param raw_token: token as generated by secrets.token_urlsafe and decoded from the client's JWT
+        :return string: 64 character sha256 hex digest
+        """
+
+        return hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_by_access_token(cls, session, raw_access_token):
+        return session.query(cls).filter_by(access_token=cls.hash_token(raw_access_token)).first()
+
+    def matches_refresh_token(self, raw_refresh_token):
+        return hmac.compare_digest(self.refresh_token or '', self.hash_token(raw_refresh_token))
+
+    def create_token_response(self, raw_access_token, raw_refresh_token):
         access_token = {
-            'access_token': self.access_token
+            'access_token': raw_access_token
         }
 
         refresh_token = {
-            'refresh_token': self.refresh_token
+            'refresh_token': raw_refresh_token
         }
 
         encoded_access_token = jwt.encode(access_token, API_KEY, algorithm="HS256")
@@ -97,19 +131,51 @@ class Token(Base):
         return response
 
     @staticmethod
-    def clear_old_tokens(session):
+    def clear_old_tokens(session, batch_size=1000):
+        """ Deletes tokens whose refresh token expired more than a day ago, batch_size rows per DELETE statement so a
+            large backlog never holds long locks on the token table. Run by the scheduler rather than on login.
+
+        :param session: database connection
+        :param batch_size: maximum number of tokens removed per statement and commit
+        :return int: number of tokens removed
+        """
+
         one_day_timedelta = datetime.timedelta(days=1)
         yesterday = datetime.datetime.now() - one_day_timedelta
 
-        expired_tokens = session.query(Token).filter(Token.refresh_expiration < yesterday).all()
+        removed = 0
+        while True:
+            expired_ids = [token_id for token_id, in session.query(Token.id)
+                           .filter(Token.refresh_expiration < yesterday)
+                           .limit(batch_size)]
+            if not expired_ids:
+                break
+
+            session.query(Token).filter(Token.id.in_(expired_ids)).delete(synchronize_session=False)
+            session.commit()
+            removed += len(expired_ids)
 
-        for token in expired_tokens:
-            session.delete(token)
+            if len(expired_ids) < batch_size:
+                break
+
+        return removed
+
+class Leaderboard(Base):
+    __tablename__ = 'leaderboard'
+    __table_args__ = (UniqueConstraint('category', 'chapter', 'sub_chapter', name='uq_leaderboard_board'),)
+    id = Column(Integer, primary_key=True)
+    category = Column(String(32))
+    chapter = Column(String(32))
+    sub_chapter = Column(String(32))
+    total_submissions = Column(Integer)
 
-        session.commit()
 
 class Submission(Base):
     __tablename__ = 'submission'
+    __table_args__ = (
+        Index('ix_submission_board', 'category', 'chapter', 'sub_chapter', 'voided', 'time_complete'),
+        Index('ix_submission_rank_voided', 'rank', 'voided'),
+    )
     id = Column(Integer, primary_key=True)
     date = Column(DateTime)
     game_title = Column(String(32))
@@ -120,20 +186,48 @@ class Submission(Base):
     description = Column(String(255))
     video_url = Column(String(255))
     rank = Column(Integer)
-    points = Column(Integer)
     reported = Column(Boolean)
     reported_date = Column(DateTime)
     reported_message = Column(String(255))
     reported_by = Column(Integer, ForeignKey('user.id'))
     voided = Column(Boolean)
     highlighted = Column(Boolean)
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
+
+    # Points are derived from the rank and the size of the board so adding a run only rewrites the ranks below it.
+    # Voided runs keep the rank they had and are left out of the board size, so they have no points
+    points = column_property(
+        case(
+            (voided == True, null()),
+            else_=select(Leaderboard.total_submissions - rank + 1)
+            .where(Leaderboard.category == category,
+                   Leaderboard.chapter == chapter,
+                   Leaderboard.sub_chapter == sub_chapter)
+            .correlate_except(Leaderboard)
+            .scalar_subquery()
+        )
+    )
 
     reporter = relationship('User', foreign_keys=[reported_by], backref='reported_submissions')
 
 
+class TimeframeScore(Base):
+    __tablename__ = 'timeframe_score'
+    __table_args__ = (
+        UniqueConstraint('category', 'time_frame', 'user_id', name='uq_timeframe_score_user'),
+        # Serves the user leaderboards in their order, highest score first and ties by user id
+        Index('ix_timeframe_score_board', 'category', 'time_frame', text('score DESC'), 'user_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    category = Column(String(32))
+    time_frame = Column(String(16))
+    user_id = Column(Integer, ForeignKey('user.id'))
+    score = Column(Integer)
+
+
 class LeagueRun(Base):
     __tablename__ = 'league_run'
+    __table_args__ = (Index('ix_league_run_board', 'season', 'week', 'level', 'time_complete'),)
     id = Column(Integer, primary_key=True)
     date = Column(DateTime)
     season = Column(String(16))
@@ -146,6 +240,49 @@ class LeagueRun(Base):
     points = Column(Integer)
 
 
+class ChangeCounter(Base):
+    __tablename__ = 'change_counter'
+    name = Column(String(128), primary_key=True)
+    version = Column(Integer)
+
+
+class DiscordOutbox(Base):
+    """ Record notifications waiting to be posted to the Discord bot. Rows are written in the same transaction as the
+        submission that set the record and deleted once the bot accepts them, rows that keep failing are kept with
+        status 'dead' for inspection. A dispatcher posting a row marks it 'sending' until next_attempt_at.
+    """
+    __tablename__ = 'discord_outbox'
+    __table_args__ = (Index('ix_discord_outbox_due', 'status', 'next_attempt_at'),)
+    id = Column(Integer, primary_key=True)
+    payload = Column(Text)
+    status = Column(String(16))
+    attempts = Column(Integer)
+    created_at = Column(DateTime)
+    next_attempt_at = Column(DateTime)
+    last_error = Column(String(255))
+
+
+class HighlightSnapshot(Base):
+    """ Serialized highlighted submissions served by /api/submission/highlights, rebuilt when the highlights change.
+        Workers keep the parsed payload in memory and reload it when version changes.
+    """
+    __tablename__ = 'highlight_snapshot'
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer)
+    payload = Column(Text)
+    created_at = Column(DateTime)
+    # Time of the last daily rotation, lets a new scheduler leader run a rotation its predecessor missed
+    rotated_at = Column(DateTime)
+
+
+class SchedulerLease(Base):
+    """ Lock row naming the process allowed to run the scheduled jobs until expires_at. """
+    __tablename__ = 'scheduler_lease'
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128))
+    expires_at = Column(DateTime)
+
+
 class Badge(Base):
     __tablename__ = 'badge'
     id = Column(Integer, primary_key=True)
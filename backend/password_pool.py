@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import TooManyRequests
+import threading
+import os
+
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', '2'))
+BCRYPT_QUEUE_LIMIT = int(os.getenv('BCRYPT_QUEUE_LIMIT', '8'))
+
+
+class PasswordPool:
+    """ Runs bcrypt work on a fixed number of threads so a burst of logins can use at most `workers` cores of a worker
+        process. At most queue_limit checks wait behind the running ones, any further check is rejected with a 429
+        right away instead of piling up request threads.
+    """
+
+    def __init__(self, workers=BCRYPT_WORKERS, queue_limit=BCRYPT_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.rejected = 0
+        self._stats_lock = threading.Lock()
+
+    def run(self, func, *args):
+        """ Runs func(*args) on the pool and waits for its result.
+
+        :raises TooManyRequests: when every worker is busy and the queue is full
+        """
+
+        if not self.slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise TooManyRequests(description="Too many login attempts are being processed, try again shortly.",
+                                  retry_after=1)
+
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    def stats(self):
+        """ Size of the pool and the number of checks rejected since the worker started. """
+
+        with self._stats_lock:
+            return {'workers': self.workers, 'queue_limit': self.queue_limit, 'rejected': self.rejected}
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from flask import request, current_app, g
+import functools
+import threading
+import time
+import os
+import re
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL')
+
+
+class LRUCacheBackend:
+    """ In-process cache holding at most max_entries values, evicting the least recently used one first.
+        Every entry expires after ttl seconds. Each gunicorn worker has its own copy, so the ttl bounds how long a
+        worker can serve data that another worker has already invalidated.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCacheBackend:
+    """ Cache shared by every worker, stored through a redis-style client (get, set with ex=, delete, scan_iter).
+        Any object with those methods can stand in for the client locally.
+    """
+
+    def __init__(self, client, ttl=RESPONSE_CACHE_TTL, namespace='ito:'):
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, key):
+        return self.client.get(self.namespace + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.namespace + key, value, ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.client.delete(self.namespace + key)
+
+    def delete_prefix(self, prefix):
+        pattern = re.sub(r'([*?\[\]\\])', r'\\\1', self.namespace + prefix) + '*'
+        for key in self.client.scan_iter(match=pattern):
+            self.client.delete(key)
+
+    def clear(self):
+        self.delete_prefix('')
+
+
+class ResponseCache:
+    """ Caches the JSON body of successful GET responses keyed by route namespace, route parameters and query string.
+        Writers invalidate exactly the namespaces and parameters their change affects.
+        Under conditional_response the key also holds the response's ETag, so a worker whose local entry was built before
+        another worker's write misses the cache instead of serving the old body with the new ETag.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Requests run on several threads of a worker, += on a shared counter can lose updates
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(namespace, *parts):
+        return namespace + '/' + ''.join(f'{part}/' for part in parts)
+
+    def cached(self, namespace, key=None):
+        """ Decorator for a route returning an ito_api_response. Place it directly below @app.route so cache hits never
+            open a database session, or directly below @conditional_response so entries are keyed on the data versions.
+
+        :param namespace: name used to invalidate every entry of the route
+        :param key: function of the route's view arguments returning the parameters to key (and invalidate) on
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def cached_route(*args, **kwargs):
+                parts = key(**kwargs) if key else ()
+                cache_key = self._make_key(namespace, *parts) + '?' + request.query_string.decode()
+
+                # Set by conditional_response from the change counters the response was built from
+                response_version = g.get('response_version')
+                if response_version is not None:
+                    cache_key += '#' + response_version
+
+                body = self.backend.get(cache_key)
+                if body is not None:
+                    with self._stats_lock:
+                        self.hits += 1
+                    return current_app.response_class(body, status=200, mimetype='application/json')
+
+                with self._stats_lock:
+                    self.misses += 1
+                response = current_app.make_response(func(*args, **kwargs))
+
+                if response.status_code == 200:
+                    self.backend.set(cache_key, response.get_data())
+
+                return response
+
+            return cached_route
+
+        return decorator
+
+    def invalidate(self, namespace, *parts):
+        """ Drops every cached response of the namespace whose leading key parameters equal parts. """
+
+        with self._stats_lock:
+            self.invalidations += 1
+        self.backend.delete_prefix(self._make_key(namespace, *parts))
+
+    def clear(self):
+        with self._stats_lock:
+            self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self):
+        """ Hits, misses and invalidations of this worker since it started. """
+
+        with self._stats_lock:
+            return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+
+def create_response_cache():
+    """ Builds the response cache, sharing it through RESPONSE_CACHE_URL when it is set and redis is installed. """
+
+    if RESPONSE_CACHE_URL:
+        try:
+            import redis
+            return ResponseCache(SharedCacheBackend(redis.Redis.from_url(RESPONSE_CACHE_URL)))
+        except ImportError:
+            print("RESPONSE_CACHE_URL is set but redis is not installed, using the in-process cache")
+
+    return ResponseCache(LRUCacheBackend())
+
+
+response_cache = create_response_cache()
@@ -1,16 +1,20 @@
 from flask import request
 from apifairy import authenticate
-from sqlalchemy import desc, or_, asc
+from sqlalchemy import or_, asc
+from sqlalchemy.orm import selectinload
 import datetime
 
 from app import app
 from models import User, Submission, LeagueRun
-from routes.helpers import (ito_api_response, get_single_entry, get_all_list, update_submission_rankings, \
-                            update_player_scores, convert_time_to_int, organize_submissions, get_user_categories, \
-                            categories_to_bits, extract_time_components, get_first_place_run, notify_discord_bot, \
-                            convert_int_to_time, update_league_rankings, is_username_available, format_chapter, \
-                            format_subchapter)
+from routes.helpers import (ito_api_response, update_submission_rankings, update_player_scores, convert_time_to_int, \
+                            organize_submissions, get_user_categories, categories_to_bits, extract_time_components, \
+                            get_first_place_run, queue_discord_notification, update_league_rankings, \
+                            is_username_available, format_chapter, format_subchapter, get_user_rank, bump_versions, \
+                            invalidate_board_responses, build_highlight_snapshot)
 from routes.auth_routes import token_auth
+from response_cache import response_cache
+from serializers import get_single_entry, get_all_list, convert_int_to_time
+from token_cache import token_cache
 from session import db_session
 
 @app.route('/api/users/create', methods=['POST'])
@@ -88,8 +92,23 @@ def edit_account(session):
         return_data['categories'] = get_user_categories(return_data['lb_pref'])
         return_data.pop('password')
 
+        bump_versions(session, 'users')
+
+        # Highlighted runs are stored with their runner's username, flag and color
+        has_highlighted_runs = (
+            session.query(Submission.id)
+            .filter(Submission.user_id == curr_user.id, Submission.highlighted == True)
+            .first()
+        )
+        if has_highlighted_runs:
+            build_highlight_snapshot(session)
+
         session.commit()
 
+        # Usernames, flags and colors are embedded in every cached leaderboard
+        response_cache.clear()
+        token_cache.invalidate_users([curr_user.id])
+
         return ito_api_response(success=True, data=return_data, message='Account edited successfully', status_code=200)
 
     except Exception as error:
@@ -121,64 +140,37 @@ def get_me():
 def profile_page(session, username):
     try:
 
-        # Need to order the submissions by date
+        # Submissions, league runs and badges are each fetched in one extra query alongside the user
         user = (
             session.query(User)
             .filter(User.username == username)
+            .options(selectinload(User.submissions), selectinload(User.league_runs), selectinload(User.badges))
             .first()
         )
 
         if not user:
             return ito_api_response(success=False, message='User not found', status_code=404)
 
-        users_query = (
-            session.query(User)
-            .order_by(desc(User.score))
+        sorted_submissions = sorted(
+            [sub for sub in user.submissions if not sub.voided],
+            key=lambda x: x.date,
+            reverse=True
         )
 
-        # Handle regular submissions
-        if user.submissions:
-            sorted_submissions = sorted(
-                [sub for sub in user.submissions if not sub.voided],
-                key=lambda x: x.date,
-                reverse=True
-            )
-        else:
-            sorted_submissions = []
+        league_runs = sorted(user.league_runs, key=lambda x: x.date or datetime.datetime.min, reverse=True)
 
-        # Handle league runs
-        league_runs = (
-            session.query(LeagueRun)
-            .filter(LeagueRun.user_id == user.id)
-            .order_by(desc(LeagueRun.date))
-            .all()
-        )
-
-        user_rank = 0
-        for index, ranked_user in enumerate(users_query):
-            if ranked_user.username == username:
-                user_rank = index + 1
-                break
+        user_rank = get_user_rank(session, user)
 
         data = get_single_entry(user)
 
         # Regular submissions data
-        if user.submissions:
-            data['submissions'] = get_all_list(sorted_submissions)
-            data['total_runs'] = len(user.submissions)
-            data['runs'] = len([submission for submission in user.submissions if not submission.voided])
-        else:
-            data['submissions'] = []
-            data['total_runs'] = 0
-            data['runs'] = 0
+        data['submissions'] = get_all_list(sorted_submissions)
+        data['total_runs'] = len(user.submissions)
+        data['runs'] = len(sorted_submissions)
 
         # League runs data
-        if league_runs:
-            data['league_runs'] = get_all_list(league_runs)
-            data['total_league_runs'] = len(league_runs)
-        else:
-            data['league_runs'] = []
-            data['total_league_runs'] = 0
+        data['league_runs'] = get_all_list(league_runs)
+        data['total_league_runs'] = len(league_runs)
 
         data['rank'] = user_rank
         data['ordered_submissions'], data['chapter_scores'] = organize_submissions(data['submissions'])
@@ -211,6 +203,8 @@ def set_background_color(session):
 
         session.commit()
 
+        token_cache.invalidate_users([current_user.id])
+
         return ito_api_response(success=True, message='Background color successfully changed', status_code=200)
     except Exception as error:
         print(error)
@@ -283,10 +277,9 @@ def create_submission(session):
                                          description=description)
 
         session.add(new_user_submission)
-        session.commit()
 
-        update_submission_rankings(session, category, chapter, sub_chapter)
-        update_player_scores(session)
+        # The submission, the new ranks and any record notification are committed together by update_player_scores
+        update_submission_rankings(session, category, chapter, sub_chapter, commit=False)
 
         first_place_after = get_first_place_run(session, category, chapter, sub_chapter)
 
@@ -309,8 +302,8 @@ def create_submission(session):
                 'improvement_ms': None
             }
 
-            # Send notification to Discord bot via webhook
-            notify_discord_bot(record_data)
+            # Queue notification to Discord bot via webhook
+            queue_discord_notification(session, record_data)
         elif first_place_after.id != first_place_before.id:
             record_data = {
                 'username': curr_user.username,
@@ -323,8 +316,14 @@ def create_submission(session):
                 'improvement_ms': first_place_before.time_complete - first_place_after.time_complete
             }
 
-            # Send notification to Discord bot via webhook
-            notify_discord_bot(record_data)
+            # Queue notification to Discord bot via webhook
+            queue_discord_notification(session, record_data)
+
+        update_player_scores(session, category, chapter, sub_chapter)
+        invalidate_board_responses(category, chapter, sub_chapter)
+
+        # The commit in update_player_scores expired the submission, reload it with its rank and points
+        session.refresh(new_user_submission)
 
         return ito_api_response(success=True, data=get_single_entry(new_user_submission), message='Submission created',
                                 status_code=200)
@@ -386,7 +385,8 @@ def edit_existing_submission(session):
 
         update_submission_rankings(session, submission_to_edit.category, submission_to_edit.chapter,
                                    submission_to_edit.sub_chapter)
-        update_player_scores(session)
+        update_player_scores(session, submission_to_edit.category, submission_to_edit.chapter,
+                             submission_to_edit.sub_chapter)
 
         data['rank'] = submission_to_edit.rank
 
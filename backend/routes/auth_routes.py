@@ -5,10 +5,12 @@ from apifairy import authenticate
 import secrets
 import datetime
 import jwt
-from werkzeug.exceptions import Unauthorized, Forbidden
+from werkzeug.exceptions import Unauthorized, Forbidden, TooManyRequests
 from app import app
 from models import User, Token
 from routes.helpers import ito_api_response
+from token_cache import token_cache
+from password_pool import password_pool
 
 basic_auth = HTTPBasicAuth()
 token_auth = HTTPTokenAuth(scheme='Bearer')
@@ -33,6 +35,15 @@ def basic_auth_error(status=401):
         'description': error.description,
     }, error.code, {'WWW-Authenticate': 'Form'}
 
+@app.errorhandler(TooManyRequests)
+def too_many_requests(error):
+    """ Logins rejected by a full password pool get the usual JSON response instead of werkzeug's HTML error page. """
+
+    response, status_code = ito_api_response(success=False, message=error.description, status_code=429)
+    response.headers['Retry-After'] = str(error.retry_after or 1)
+    return response, status_code
+
+
 @basic_auth.verify_password
 def basic_auth_verify(username, password):
     """
@@ -45,17 +56,19 @@ def basic_auth_verify(username, password):
     """
 
     if username and password:
-        session = Session()
+        session = get_request_session()
         get_user = session.query(User).filter(User.username.ilike(username)).first()
-        if not get_user:
-            session.close()
-            return None
-        elif get_user.decode_password(password):
-            session.close()
+        if get_user and password_pool.run(get_user.decode_password, password):
+            if get_user.password_needs_rehash():
+                # BCRYPT_ROUNDS changed since this password was hashed, upgrade it while the plain text is known.
+                # A busy pool only postpones the upgrade to a later login.
+                try:
+                    password_pool.run(get_user.generate_password_hash, password)
+                    session.commit()
+                except TooManyRequests:
+                    pass
             return get_user
-        else:
-            session.close()
-            return None
+        return None
 
 @token_auth.verify_token
 def token_auth_verify(access_token):
@@ -66,22 +79,27 @@ def token_auth_verify(access_token):
     :return: User object if the access token is valid; else None
     :rtype: User
     """
-    session = Session()
+    session = get_request_session()
     try:
         if access_token:
             access_decode = jwt.decode(access_token, API_KEY, algorithms=['HS256'])['access_token']
 
-            database_token = session.query(Token).filter_by(access_token=access_decode).first()
+            cached_user = token_cache.get_user(access_decode)
+            if cached_user is not None:
+                return cached_user
 
+            database_token = Token.get_by_access_token(session, access_decode)
 
             if database_token.access_expiration > datetime.datetime.now():
-                session.close()
-                return session.query(User).filter_by(id=database_token.user).first()
+                generation = token_cache.user_generation(database_token.user)
+                user = session.query(User).filter_by(id=database_token.user).first()
+                if user is not None:
+                    token_cache.set_user(access_decode, database_token.access_expiration, user, generation)
+                return user
             else:
-                session.close()
                 return None
     except Exception:
-        session.close()
+        session.rollback()
         return None
 
 def _create_and_add_token(session, curr_user_id):
@@ -91,15 +109,14 @@ def _create_and_add_token(session, curr_user_id):
     refresh_token = secrets.token_urlsafe(32)
     refresh_expiration = datetime.datetime.now() + datetime.timedelta(days=7)
 
-    new_token = Token(access_token=access_token, access_expiration=access_expiration, refresh_token=refresh_token,
-                      refresh_expiration=refresh_expiration, user=curr_user_id)
-
-    new_token.clear_old_tokens(session)
+    new_token = Token(access_token=Token.hash_token(access_token), access_expiration=access_expiration,
+                      refresh_token=Token.hash_token(refresh_token), refresh_expiration=refresh_expiration,
+                      user=curr_user_id)
 
     session.add(new_token)
     session.commit()
 
-    return new_token
+    return new_token, access_token, refresh_token
 
 
 @app.route('/api/tokens/create', methods=['POST'])
@@ -116,9 +133,9 @@ def token_creation(session):
     """
     curr_user = basic_auth.current_user()
 
-    new_token = _create_and_add_token(session, curr_user.id)
+    new_token, access_token, refresh_token = _create_and_add_token(session, curr_user.id)
 
-    return new_token.create_token_response(), 200
+    return new_token.create_token_response(access_token, refresh_token), 200
 
 @app.route('/api/tokens/refresh', methods=['PUT'])
 @db_session
@@ -146,13 +163,13 @@ def token_refresh(session):
                             API_KEY, algorithms=['HS256'])['access_token']
         refresh = jwt.decode(bearer_refresh_token, API_KEY, algorithms=['HS256'])['refresh_token']
 
-        database_token = session.query(Token).filter_by(access_token=access).first()
+        database_token = Token.get_by_access_token(session, access)
 
         if not database_token:
             return ito_api_response(success=False, message="The access token provided cannot be found in the database.",
                                     status_code=460)
 
-        if database_token.refresh_token != refresh:
+        if not database_token.matches_refresh_token(refresh):
             return ito_api_response(success=False, message="The provided access token and refresh token do not match.",
                                     status_code=401)
 
@@ -163,11 +180,13 @@ def token_refresh(session):
         new_access_token = secrets.token_urlsafe(32)
         new_access_expiration = datetime.datetime.now() + datetime.timedelta(minutes=20)
 
-        database_token.access_token = new_access_token
+        database_token.access_token = Token.hash_token(new_access_token)
         database_token.access_expiration = new_access_expiration
         session.commit()
 
-        data = database_token.create_token_response()
+        token_cache.invalidate(access)
+
+        data = database_token.create_token_response(new_access_token, refresh)
 
         return data, 200
 
@@ -201,7 +220,7 @@ def token_delete(session):
         return ito_api_response(success=False, message="Please provide an access token.",
                                 status_code=408)
 
-    access_token = session.query(Token).filter_by(access_token=access).first()
+    access_token = Token.get_by_access_token(session, access)
 
     if not access_token:
         return ito_api_response(success=False, message="The access token provided cannot be found in the database.",
@@ -210,5 +229,7 @@ def token_delete(session):
     session.delete(access_token)
     session.commit()
 
+    token_cache.invalidate(access)
+
     return ito_api_response(success=True, message="Successfully deleted the access token. The user may logout",
                             status_code=200)
@@ -1,11 +1,21 @@
-from models import User, Submission, LeagueRun
-from flask import jsonify
+from models import (User, Submission, LeagueRun, Leaderboard, TimeframeScore, ChangeCounter, DiscordOutbox,
+                    SchedulerLease, HighlightSnapshot)
+from flask import jsonify, request, current_app, g
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from response_cache import response_cache
+from serializers import get_submission_entry, query_submission_rows, get_submission_row_entry
+from token_cache import token_cache
+from session import get_request_session
+import functools
+import hashlib
+import json
+import os
 import datetime
 import requests
 from datetime import timedelta
-import time
 import re
-import threading
 
 
 LEAGUE_PLACEMENT_POINTS = {
@@ -14,15 +24,44 @@ LEAGUE_PLACEMENT_POINTS = {
     11: 14, 12: 12, 13: 10, 14: 9, 15: 8
 }
 
-def calculate_timeframe_score(user, time_frame, category):
-    """ Calculates the user's score based on the specified time frame.
+# Categories and time frames kept in the timeframe_score table for /api/leaderboard/users/<category>/<time_frame>
+TIMEFRAME_CATEGORIES = ('any%', 'inbounds', 'main board')
+TIME_FRAMES = ('all_time', 'monthly', 'weekly')
 
-    :param user: The user object containing submissions
+# Dialects that rank a whole sub_chapter in a single windowed UPDATE
+SET_BASED_RANKING_DIALECTS = {'postgresql', 'mysql', 'mariadb'}
+
+DISCORD_BOT_URL = os.getenv('DISCORD_BOT_URL', 'https://ito-website-discord-bot.onrender.com')
+DISCORD_OUTBOX_BATCH_SIZE = int(os.getenv('DISCORD_OUTBOX_BATCH_SIZE', '20'))
+DISCORD_OUTBOX_MAX_ATTEMPTS = int(os.getenv('DISCORD_OUTBOX_MAX_ATTEMPTS', '10'))
+DISCORD_OUTBOX_BASE_DELAY = 30  # seconds, doubled after every failed attempt
+DISCORD_OUTBOX_MAX_DELAY = 1800  # seconds
+DISCORD_OUTBOX_HTTP_TIMEOUT = 30  # seconds, the bot answers a batch within its 25 second delivery timeout
+# Other dispatchers leave claimed rows alone until the claim expires, longer than the request posting them can take
+DISCORD_OUTBOX_CLAIM_SECONDS = int(os.getenv('DISCORD_OUTBOX_CLAIM_SECONDS', '120'))
+
+# Only the outbox dispatcher posts to the bot, keeping its connection alive between batches
+_discord_http = requests.Session()
+
+# The highlight snapshot is a single row
+HIGHLIGHT_SNAPSHOT_ID = 1
+
+# (version, parsed payload) of the highlight snapshot last read by this worker
+_highlight_snapshot = (None, None)
+
+def calculate_timeframe_scores(session, user_ids, time_frame, category):
+    """ Calculates a batch of users' scores for the specified time frame in a single grouped query.
+
+    :param session: database connection
+    :param user_ids: ids of the users to calculate the score for, None for every user with a counted submission
     :param time_frame: The time frame to calculate the score for ('all_time', 'monthly', 'weekly')
-    :param category: The category of the submission
-    :return: The calculated score
+    :param category: The category of the submission, 'main board' counts every category
+    :return: dict of user id to the calculated score, 0 for given users without any counted submission
     """
-    timeframe_total_score = 0
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
 
     now = datetime.datetime.now()
     if time_frame == 'monthly':
@@ -32,49 +71,262 @@ def calculate_timeframe_score(user, time_frame, category):
     else:
         cutoff_date = None
 
-    for submission in user.submissions:
-        if submission.voided:
-            continue
+    scores_query = (
+        session.query(Submission.user_id, func.sum(Submission.points))
+        .filter(Submission.voided == False)
+        .group_by(Submission.user_id)
+    )
 
-        if category != 'main board' and submission.category != category:
-            continue
+    if user_ids is not None:
+        scores_query = scores_query.filter(Submission.user_id.in_(user_ids))
 
-        if cutoff_date and submission.date < cutoff_date:
-            continue
+    if category != 'main board':
+        scores_query = scores_query.filter(Submission.category == category)
+
+    if cutoff_date:
+        scores_query = scores_query.filter(Submission.date >= cutoff_date)
+
+    timeframe_scores = dict(scores_query.all())
 
-        timeframe_total_score += submission.points
+    if user_ids is None:
+        return {user_id: score or 0 for user_id, score in timeframe_scores.items()}
 
-    return timeframe_total_score
+    return {user_id: timeframe_scores.get(user_id) or 0 for user_id in user_ids}
 
-def update_player_scores(session):
-    """ Updates all the users' scores in the database when a new submission is made.
+def update_player_scores(session, category=None, chapter=None, sub_chapter=None, user_ids=None):
+    """ Updates the users' scores in the database when a new submission is made.
+        When a sub_chapter is given only the users with a run on that board (plus any extra user_ids, e.g. the owner
+        of a removed run) are rescored, since those are the only scores a re-ranking of the board can change.
+        Calling it without a board rebuilds every verified user's score and can be used to repair drift.
 
     :param session: database connection
+    :param category: category of the re-ranked board
+    :param chapter: chapter of the re-ranked board
+    :param sub_chapter: subchapter of the re-ranked board
+    :param user_ids: additional user ids whose score needs to be rescored
     """
 
-    users = session.query(User).filter(User.role >= 1).all()
+    users_query = session.query(User).filter(User.role >= 1)
+    scores_query = (
+        session.query(Submission.user_id, func.sum(Submission.points))
+        .filter(Submission.voided == False)
+        .group_by(Submission.user_id)
+    )
+
+    if sub_chapter is not None or user_ids:
+        affected_user_ids = set(user_ids or [])
+        if sub_chapter is not None:
+            board_users = (
+                session.query(Submission.user_id)
+                .filter(Submission.category == category,
+                        Submission.chapter == chapter,
+                        Submission.sub_chapter == sub_chapter)
+                .distinct()
+            )
+            affected_user_ids.update(user_id for user_id, in board_users)
+
+        if not affected_user_ids:
+            session.commit()
+            return
+
+        users_query = users_query.filter(User.id.in_(affected_user_ids))
+        scores_query = scores_query.filter(Submission.user_id.in_(affected_user_ids))
+    else:
+        affected_user_ids = None
+
+    new_scores = dict(scores_query.all())
+    changed_user_ids = []
+
+    for user in users_query.all():
+        new_total_score = new_scores.get(user.id) or 0
+        if user.score != new_total_score:
+            user.score = new_total_score
+            changed_user_ids.append(user.id)
 
-    for user in users:
-        new_total_score = 0
-        for submission in user.submissions:
-            if submission.voided:
-                continue
-            new_total_score += submission.points
-        user.score = new_total_score
+    update_timeframe_scores(session, affected_user_ids)
+    bump_versions(session, 'scores')
 
     session.commit()
 
+    response_cache.invalidate('user_total_leaderboard')
+    # Cached token users carry their score, which /api/me returns
+    token_cache.invalidate_users(changed_user_ids)
+
     return
 
 
-def update_submission_rankings(session, category, chapter, sub_chapter):
+def get_user_rank(session, user):
+    """ Gets the user's global rank by score. Users with the same score share a rank, so the rank is one more than the
+        number of users with a strictly higher score. Served by the index on User.score.
+
+    :param session: database connection
+    :param user: user to rank
+    :return: int of the user's rank
+    """
+
+    higher_scores = (
+        session.query(func.count(User.id))
+        .filter(User.score > (user.score or 0))
+        .scalar()
+    )
+
+    return higher_scores + 1
+
+
+def update_timeframe_scores(session, user_ids=None):
+    """ Refreshes the precomputed timeframe_score rows used by the user leaderboards for every category and time frame.
+        Only the given users are refreshed, or every verified user when user_ids is None. The caller commits.
+
+    :param session: database connection
+    :param user_ids: ids of the users whose scores changed
+    :return: number of rows that were added or changed
+    """
+
+    users_query = session.query(User.id).filter(User.role >= 1)
+    existing_query = session.query(TimeframeScore)
+
+    if user_ids is not None:
+        users_query = users_query.filter(User.id.in_(user_ids))
+        existing_query = existing_query.filter(TimeframeScore.user_id.in_(user_ids))
+
+    verified_user_ids = [user_id for user_id, in users_query.all()]
+    existing_scores = {(row.user_id, row.category, row.time_frame): row for row in existing_query.all()}
+    changed_rows = 0
+
+    # A full rebuild groups every user's runs instead of sending every verified id in each of the nine queries
+    score_user_ids = None if user_ids is None else verified_user_ids
+
+    for category in TIMEFRAME_CATEGORIES:
+        for time_frame in TIME_FRAMES:
+            new_scores = calculate_timeframe_scores(session, score_user_ids, time_frame, category)
+
+            for user_id in verified_user_ids:
+                new_score = new_scores.get(user_id, 0)
+                row = existing_scores.get((user_id, category, time_frame))
+
+                if row is None:
+                    session.add(TimeframeScore(user_id=user_id, category=category, time_frame=time_frame,
+                                               score=new_score))
+                    changed_rows += 1
+                elif row.score != new_score:
+                    row.score = new_score
+                    changed_rows += 1
+
+    return changed_rows
+
+
+def update_submission_rankings(session, category, chapter, sub_chapter, commit=True):
     """ Updates all the individual submission rankings in their sub_chapter after a new submission is made.
-    Assigns ranks and points where last gets 1 point, 2nd last gets 2 points, etc.
+    Points are derived from the rank and the board size stored on the Leaderboard row (last gets 1 point, 2nd last
+    gets 2 points, etc.), so only the submissions whose rank actually changed are rewritten.
+    Postgres and MySQL rank the board in a single UPDATE using window functions, other databases (SQLite) fall back
+    to ranking the board in Python.
 
     :param session: database connection
     :param category: category for the submission
     :param chapter: chapter for the submission
     :param sub_chapter: subchapter for the submission
+    :param commit: when False the changes are left in the caller's transaction, which must then commit and call
+                   invalidate_board_responses itself
+    """
+
+    if session.get_bind().dialect.name in SET_BASED_RANKING_DIALECTS:
+        total_submissions = _rank_submissions_set_based(session, category, chapter, sub_chapter)
+    else:
+        total_submissions = _rank_submissions_python(session, category, chapter, sub_chapter)
+
+    leaderboard_query = session.query(Leaderboard).filter(Leaderboard.category == category,
+                                                          Leaderboard.chapter == chapter,
+                                                          Leaderboard.sub_chapter == sub_chapter)
+    leaderboard = leaderboard_query.first()
+
+    if leaderboard is None:
+        try:
+            with session.begin_nested():
+                leaderboard = Leaderboard(category=category, chapter=chapter, sub_chapter=sub_chapter)
+                session.add(leaderboard)
+        except IntegrityError:
+            # Another request ranked the first run of this board at the same time
+            leaderboard = leaderboard_query.populate_existing().one()
+
+    if leaderboard.total_submissions != total_submissions:
+        leaderboard.total_submissions = total_submissions
+
+    # Highlighted runs are served with their rank and points from the snapshot
+    board_has_highlight = (
+        session.query(Submission.id)
+        .filter(Submission.category == category,
+                Submission.chapter == chapter,
+                Submission.sub_chapter == sub_chapter,
+                Submission.highlighted == True)
+        .first()
+    )
+    if board_has_highlight:
+        build_highlight_snapshot(session)
+
+    bump_versions(session, board_version_name(category, chapter, sub_chapter), 'submissions')
+
+    if not commit:
+        return
+
+    session.commit()
+
+    invalidate_board_responses(category, chapter, sub_chapter)
+
+
+def invalidate_board_responses(category, chapter, sub_chapter):
+    """ Drops the cached responses that show runs from the given sub_chapter.
+
+    :param category: category of the changed board
+    :param chapter: chapter of the changed board
+    :param sub_chapter: subchapter of the changed board
+    """
+
+    response_cache.invalidate('chapter_leaderboard', category, chapter, sub_chapter)
+    response_cache.invalidate('recent_runs')
+
+
+def _rank_submissions_set_based(session, category, chapter, sub_chapter):
+    """ Ranks a sub_chapter with one UPDATE ... FROM (SELECT RANK() OVER ...) statement, skipping rows whose rank is
+    unchanged. RANK() gives tied times the same rank and skips the following ranks, matching _rank_submissions_python.
+
+    :return: number of non-voided submissions on the board
+    """
+
+    session.execute(_board_ranking_update(category, chapter, sub_chapter))
+
+    board_filter = _ranked_board_filter(category, chapter, sub_chapter)
+    return session.query(func.count(Submission.id)).filter(*board_filter).scalar()
+
+
+def _ranked_board_filter(category, chapter, sub_chapter):
+    return (Submission.category == category,
+            Submission.chapter == chapter,
+            Submission.sub_chapter == sub_chapter,
+            Submission.voided == False)
+
+
+def _board_ranking_update(category, chapter, sub_chapter):
+    """ Builds the UPDATE ... FROM statement run by _rank_submissions_set_based. """
+
+    ranked = (
+        select(Submission.id, func.rank().over(order_by=Submission.time_complete.asc()).label('rank'))
+        .where(*_ranked_board_filter(category, chapter, sub_chapter))
+        .subquery()
+    )
+
+    return (
+        update(Submission)
+        .where(Submission.id == ranked.c.id, Submission.rank.is_distinct_from(ranked.c.rank))
+        .values(rank=ranked.c.rank)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _rank_submissions_python(session, category, chapter, sub_chapter):
+    """ Ranks a sub_chapter by loading its submissions and walking them in time order.
+
+    :return: number of non-voided submissions on the board
     """
 
     submissions = (
@@ -87,25 +339,24 @@ def update_submission_rankings(session, category, chapter, sub_chapter):
         .all()
     )
 
-    total_submissions = len(submissions)
     prev_time = None
     prev_rank = 0
     count_same_time = 1
 
     for submission in submissions:
         if submission.time_complete == prev_time:
-            submission.rank = prev_rank
+            new_rank = prev_rank
             count_same_time += 1
         else:
-            submission.rank = prev_rank + count_same_time
-            prev_rank = submission.rank
+            new_rank = prev_rank + count_same_time
+            prev_rank = new_rank
             prev_time = submission.time_complete
             count_same_time = 1
 
-        # Assign points based on reverse ranking
-        submission.points = total_submissions - submission.rank + 1
+        if submission.rank != new_rank:
+            submission.rank = new_rank
 
-    session.commit()
+    return len(submissions)
 
 
 def distribute_points(n: int):
@@ -157,8 +408,187 @@ def update_league_rankings(session, season, week, level):
         # Assign points based on distribution ranking
         run.points = LEAGUE_PLACEMENT_POINTS.get(run.rank, 0)
 
+    bump_versions(session, season_version_name(season))
+
+    session.commit()
+
+
+def get_league_top_runs(session, season, limit=3):
+    """ Fastest runs of every week and level of a season in a single windowed query.
+
+    :param session: database connection
+    :param season: season of the runs
+    :param limit: number of runs kept per week and level
+    :return: dict of (week, level) to the serialized runs ordered by time, only containing levels with runs
+    """
+
+    run_position = (
+        session.query(
+            LeagueRun.id.label('run_id'),
+            func.row_number().over(partition_by=(LeagueRun.week, LeagueRun.level),
+                                   order_by=(LeagueRun.time_complete.asc(), LeagueRun.id.asc())).label('position')
+        )
+        .filter(LeagueRun.season == season)
+        .subquery()
+    )
+
+    top_runs = (
+        session.query(LeagueRun)
+        .join(run_position, LeagueRun.id == run_position.c.run_id)
+        .options(joinedload(LeagueRun.user))
+        .filter(run_position.c.position <= limit)
+        .order_by(LeagueRun.week, LeagueRun.level, run_position.c.position)
+        .all()
+    )
+
+    runs_by_level = {}
+    for run in top_runs:
+        runs_by_level.setdefault((run.week, run.level), []).append(get_submission_entry(run))
+
+    return runs_by_level
+
+def board_version_name(category, chapter, sub_chapter):
+    """ Name of the change counter bumped whenever a sub_chapter is re-ranked. """
+    return f'board:{category}:{chapter}:{sub_chapter}'
+
+
+def season_version_name(season):
+    """ Name of the change counter bumped whenever a league season is re-ranked. """
+    return f'season:{season}'
+
+
+def bump_versions(session, *names):
+    """ Increments the given change counters in the caller's transaction, creating them on first use.
+        Conditional GETs derive their ETags from these counters.
+
+    :param session: database connection
+    :param names: names of the counters to increment
+    """
+
+    for name in names:
+        updated = (
+            session.query(ChangeCounter)
+            .filter(ChangeCounter.name == name)
+            .update({ChangeCounter.version: ChangeCounter.version + 1}, synchronize_session=False)
+        )
+
+        if updated:
+            continue
+
+        try:
+            with session.begin_nested():
+                session.add(ChangeCounter(name=name, version=1))
+        except IntegrityError:
+            # Another request created the counter first
+            session.query(ChangeCounter).filter(ChangeCounter.name == name) \
+                .update({ChangeCounter.version: ChangeCounter.version + 1}, synchronize_session=False)
+
+
+def acquire_lease(session, name, holder, duration):
+    """ Takes or renews the named lease for holder when it is free, expired or already held by holder, and commits.
+        Only the lease holder should run the work the lease guards.
+
+    :param session: database connection
+    :param name: name of the lease
+    :param holder: unique name of the process asking for the lease
+    :param duration: seconds the lease lasts without being renewed
+    :return boolean: True if holder now holds the lease
+    """
+
+    now = datetime.datetime.now()
+    expires_at = now + timedelta(seconds=duration)
+
+    # A single conditional UPDATE, so two processes can never both see the lease as theirs
+    acquired = (
+        session.query(SchedulerLease)
+        .filter(SchedulerLease.name == name,
+                (SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now))
+        .update({SchedulerLease.holder: holder, SchedulerLease.expires_at: expires_at}, synchronize_session=False)
+    )
+
+    if not acquired and session.get(SchedulerLease, name) is None:
+        try:
+            with session.begin_nested():
+                session.add(SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+            acquired = 1
+        except IntegrityError:
+            # Another process created the lease first
+            pass
+
     session.commit()
 
+    return bool(acquired)
+
+
+def get_versions(session, names):
+    """ Reads the given change counters in one query.
+
+    :param session: database connection
+    :param names: names of the counters to read
+    :return: dict of counter name to version, 0 for counters that were never bumped
+    """
+
+    counters = dict(
+        session.query(ChangeCounter.name, ChangeCounter.version)
+        .filter(ChangeCounter.name.in_(names))
+        .all()
+    )
+
+    return {name: counters.get(name, 0) for name in names}
+
+
+def conditional_response(counters=None, files=None, tags=None):
+    """ Decorator giving a GET route a weak ETag built from change counters and file modification times, answering
+        If-None-Match requests with a 304 before the route runs. Place it directly below @app.route.
+
+    :param counters: function of the route's view arguments returning the change counter names the response depends on
+    :param files: function of the route's view arguments returning the file paths the response is read from
+    :param tags: function of the route's view arguments returning strings that identify the version of any other data
+        the response is built from
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def conditional_route(*args, **kwargs):
+            version_parts = [request.full_path]
+
+            if counters:
+                names = counters(**kwargs)
+                versions = get_versions(get_request_session(), names)
+                version_parts.extend(f'{name}={versions[name]}' for name in names)
+
+            if files:
+                for path in files(**kwargs):
+                    try:
+                        stat = os.stat(path)
+                        version_parts.append(f'{path}={stat.st_mtime_ns}:{stat.st_size}')
+                    except OSError:
+                        version_parts.append(f'{path}=missing')
+
+            if tags:
+                version_parts.extend(str(tag) for tag in tags(**kwargs))
+
+            etag = hashlib.sha1('|'.join(version_parts).encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            # Keys a cached body to the versions it is tagged with, see ResponseCache.cached
+            g.response_version = etag
+            response = current_app.make_response(func(*args, **kwargs))
+
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+
+            return response
+
+        return conditional_route
+
+    return decorator
+
+
 def extract_time_components(time_str):
     """
     Given a time string in “M:SS.mmm” (or “SS.mmm”) format, return three strings
@@ -182,6 +612,23 @@ def extract_time_components(time_str):
     return ms_str, sec_str, min_str
 
 
+def normalize_board_params(category, chapter, sub_chapter):
+    """ Converts the url form of a board (any, in_bounds, underscores for spaces) to the values stored on submissions.
+
+    :param category: category from the url
+    :param chapter: chapter from the url
+    :param sub_chapter: subchapter from the url
+    :return: tuple of category, chapter and subchapter
+    """
+
+    if category == "any":
+        category = "any%"
+    if category == "in_bounds":
+        category = "inbounds"
+
+    return category, chapter.replace("_", " "), sub_chapter.replace("_", " ")
+
+
 def convert_time_to_int(time_milliseconds, time_seconds, time_minutes):
     """ Converts three strings each respectively containing minutes, seconds, and milliseconds. This conversion is used
     to store integers in the database for the time complete rather than strings.
@@ -204,112 +651,70 @@ def convert_time_to_int(time_milliseconds, time_seconds, time_minutes):
 
     return time_stored_int
 
-def convert_int_to_time(time_int):
-    """ Converts an integer queried from the database and formats it into a time string following MM:ss.mmm format.
 
-    :param time_int: integer queried from the database
-    :return: String
-    """
-
-    milliseconds = time_int % 1000
-    time_int //= 1000
-    seconds = time_int % 60
-    time_int //= 60
-    minutes = time_int
-
-    return f'{minutes}:{seconds:02d}.{milliseconds:03d}'
-
-def get_all_list(entries):
-    """ The return value of query.all() is not JSON serializable.
-        This requires adding each entry retrieved from the database to be added into a List which is JSON serializable
-        and therefore presentable to the user.
+def build_highlight_snapshot(session, rotated=False):
+    """ Serializes the currently highlighted submissions into the highlight snapshot row and bumps its version, so
+        every worker reloads it. Call it whenever highlighted runs change, the caller commits. update_submission_rankings
+        calls it when a board with a highlighted run is re-ranked, keeping their rank and points current.
 
-    :param entries: session query of the entries in the database.
-    :return list: List containing each entry of the requested data
+    :param session: database connection
+    :param rotated: whether the highlights were just rotated, recorded as the snapshot's rotated_at
     """
 
-    records = []
-    for record in entries:
-        single_record = {}
-        for i, j in record.__dict__.items():
-            if not i.startswith('_'):
-                if isinstance(j, datetime.datetime):
-                    single_record[i] = j.timestamp()
-                elif i == 'time_complete':
-                    single_record[i] = convert_int_to_time(j)
-                else:
-                    single_record[i] = j
-        records.append(single_record)
-    return records
-
-def get_single_entry(single_entry):
-    """ The return value of query.get() is not JSON serializable.
-        This requires adding the single entry to a Dictionary which is JSON serializable.
-
-    :param single_entry: session query of an entry in the database
-    :return dict: Dictionary containing a single database entry
-    """
+    highlighted_submissions = query_submission_rows(session).filter(Submission.highlighted == True).all()
+    payload = json.dumps([get_submission_row_entry(row) for row in highlighted_submissions])
 
-    if single_entry is None:
-        return None
-    single_record = {}
-    for i, j in single_entry.__dict__.items():
-        if not i.startswith('_'):
-            if isinstance(j, datetime.datetime):
-                single_record[i] = j.timestamp()
-            else:
-                single_record[i] = j
-    return single_record
+    snapshot = session.get(HighlightSnapshot, HIGHLIGHT_SNAPSHOT_ID)
+    if snapshot is None:
+        try:
+            with session.begin_nested():
+                snapshot = HighlightSnapshot(id=HIGHLIGHT_SNAPSHOT_ID, version=0)
+                session.add(snapshot)
+        except IntegrityError:
+            # Another worker created the snapshot first
+            snapshot = session.get(HighlightSnapshot, HIGHLIGHT_SNAPSHOT_ID, populate_existing=True)
+
+    # Incremented in SQL, so concurrent rebuilds each produce a new version
+    snapshot.version = HighlightSnapshot.version + 1
+    snapshot.payload = payload
+    snapshot.created_at = datetime.datetime.now()
+    if rotated:
+        snapshot.rotated_at = snapshot.created_at
 
 
-def get_submission_entry(single_entry):
-    """ Revised version of get_single_entry. Handles adding the user's username to the submission and converting the
-        time back to a string.
+def get_highlight_snapshot(session):
+    """ Highlighted submissions from the snapshot, parsed once per snapshot version in each worker. Only the snapshot's
+        version is read while it is unchanged. The snapshot is built on first use if it doesn't exist yet.
 
-    :param single_entry: session query of an entry in the database
-    :return dict: Dictionary containing a single database entry
+    :param session: database connection
+    :return list: serialized highlighted submissions
     """
 
-    if single_entry is None:
-        return None
-    single_record = {}
-    for i, j in single_entry.__dict__.items():
-        if not i.startswith('_'):
-            if isinstance(j, datetime.datetime):
-                single_record[i] = j.timestamp()
-            elif i == 'user':
-                single_record[i] = single_entry.user.username
-            elif i == 'time_complete':
-                single_record[i] = convert_int_to_time(j)
-            else:
-                single_record[i] = j
-    return single_record
+    global _highlight_snapshot
 
+    version = (
+        session.query(HighlightSnapshot.version)
+        .filter(HighlightSnapshot.id == HIGHLIGHT_SNAPSHOT_ID)
+        .scalar()
+    )
 
-def get_account_entry(user_entry):
-    """ Revised version of get_single_entry.
-        This version of the function also handles user submissions and makes them JSON serializable without having
-        to query the submissions in a second database query.
+    if version is None:
+        build_highlight_snapshot(session)
+        session.commit()
+        version = session.get(HighlightSnapshot, HIGHLIGHT_SNAPSHOT_ID).version
+
+    cached_version, highlights = _highlight_snapshot
+    if cached_version != version:
+        payload = (
+            session.query(HighlightSnapshot.payload)
+            .filter(HighlightSnapshot.id == HIGHLIGHT_SNAPSHOT_ID)
+            .scalar()
+        )
+        highlights = json.loads(payload)
+        _highlight_snapshot = (version, highlights)
 
-    :param user_entry: session query of a user in the database
-    :return dict: Dictionary containing information about the requested user
-    """
+    return highlights
 
-    if user_entry is None:
-        return None
-    single_record = {}
-    for i, j in user_entry.__dict__.items():
-        if not i.startswith('_'):
-            if isinstance(j, datetime.datetime):
-                single_record[i] = j.timestamp()
-            elif i == 'submissions':
-                submission_arr = []
-                for submission in j:
-                    submission_arr.append(get_submission_entry(submission))
-                single_record[i] = submission_arr
-            else:
-                single_record[i] = j
-    return single_record
 
 def ito_api_response(success, message, data=None, status_code=200, error=None):
     """ Structuring method to help format all API responses.
@@ -491,53 +896,134 @@ def get_first_place_run(session, category, chapter, sub_chapter):
         return None
 
 
-def notify_discord_bot(record_data):
-    """Send HTTP POST to your Discord bot webhook endpoint in a separate thread"""
-    # Start the notification process in a separate thread to avoid blocking the API response
-    thread = threading.Thread(target=_notify_discord_bot_async, args=(record_data,))
-    thread.daemon = True  # Thread will close when main program closes
-    thread.start()
+def queue_discord_notification(session, record_data):
+    """ Queues a record notification for the Discord bot. The outbox row is committed with the caller's transaction,
+        so a record is announced exactly when the submission that set it is saved, and is posted later by
+        dispatch_discord_outbox.
 
+    :param session: database connection, left uncommitted
+    :param record_data: JSON serializable record sent to the bot's webhook
+    """
 
-def _notify_discord_bot_async(record_data):
-    """Internal async function to handle Discord bot notification with health check"""
-    try:
-        base_url = "https://ito-website-discord-bot.onrender.com"
-        health_url = f"{base_url}/health"
-        webhook_url = f"{base_url}/webhook/new-record"
+    now = datetime.datetime.now()
+    session.add(DiscordOutbox(payload=json.dumps(record_data), status='pending', attempts=0, created_at=now,
+                              next_attempt_at=now))
 
-        print("Attempting to wake up Discord bot service...")
 
-        max_retries = 10
-        retry_delay = 50  # seconds
+def _claim_discord_outbox(session, batch_size):
+    """ Marks up to batch_size due outbox rows as 'sending' until DISCORD_OUTBOX_CLAIM_SECONDS from now and commits, so
+        no transaction or row lock is held while they are posted. Rows whose claim expired (the dispatcher died while
+        posting them) are due again.
 
-        for attempt in range(max_retries):
-            try:
-                print(f"Health check attempt {attempt + 1}/{max_retries}")
-                health_response = requests.get(health_url, timeout=30)
+    :return: list of (id, payload) of the claimed rows, oldest first
+    """
 
-                if health_response.status_code == 200:
-                    print("Discord bot service is healthy, sending notification...")
-                    break
-                else:
-                    print(f"Health check failed with status {health_response.status_code}, retrying...")
+    now = datetime.datetime.now()
 
-            except requests.exceptions.RequestException as e:
-                print(f"Health check attempt {attempt + 1} failed: {e}")
+    due_notifications = (
+        session.query(DiscordOutbox)
+        .filter(DiscordOutbox.status.in_(('pending', 'sending')), DiscordOutbox.next_attempt_at <= now)
+        .order_by(DiscordOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
 
-            if attempt < max_retries - 1:  # Don't sleep on the last attempt
-                time.sleep(retry_delay)
-        else:
-            print(f"Failed to wake up Discord bot service after {max_retries} attempts")
-            return
+    claimed = []
+    for notification in due_notifications:
+        notification.status = 'sending'
+        notification.next_attempt_at = now + timedelta(seconds=DISCORD_OUTBOX_CLAIM_SECONDS)
+        claimed.append((notification.id, notification.payload))
+
+    session.commit()
+
+    return claimed
 
-        print("Sending Discord notification...")
-        response = requests.post(webhook_url, json=record_data, timeout=10)
 
+def _record_discord_outbox_results(session, sent_ids, errors, pending_ids):
+    """ Deletes the rows the bot posted, schedules failed rows for a retry with exponential backoff (or marks them
+        'dead') and keeps the rows the bot is still posting claimed for a short while, in one short transaction.
+
+    :param session: database connection
+    :param sent_ids: ids of the rows the bot posted
+    :param errors: dict of id to error message of the rows that failed
+    :param pending_ids: ids of the rows the bot was still posting when it answered
+    """
+
+    now = datetime.datetime.now()
+
+    if sent_ids:
+        session.query(DiscordOutbox).filter(DiscordOutbox.id.in_(sent_ids)).delete(synchronize_session=False)
+
+    if pending_ids:
+        # Sent again with the same id after the delay, the bot answers with the result instead of posting it again
+        session.query(DiscordOutbox).filter(DiscordOutbox.id.in_(pending_ids)) \
+            .update({DiscordOutbox.next_attempt_at: now + timedelta(seconds=DISCORD_OUTBOX_BASE_DELAY)},
+                    synchronize_session=False)
+
+    if errors:
+        for notification in session.query(DiscordOutbox).filter(DiscordOutbox.id.in_(list(errors))).all():
+            error = errors[notification.id]
+            notification.attempts += 1
+            notification.last_error = error[:255]
+            if notification.attempts >= DISCORD_OUTBOX_MAX_ATTEMPTS:
+                notification.status = 'dead'
+                print(f"Discord notification {notification.id} dead after {notification.attempts} attempts: {error}")
+            else:
+                delay = min(DISCORD_OUTBOX_BASE_DELAY * 2 ** (notification.attempts - 1), DISCORD_OUTBOX_MAX_DELAY)
+                notification.status = 'pending'
+                notification.next_attempt_at = now + timedelta(seconds=delay)
+
+    session.commit()
+
+
+def dispatch_discord_outbox(session, batch_size=DISCORD_OUTBOX_BATCH_SIZE):
+    """ Posts due outbox rows to the Discord bot's webhook in a single request, so the bot can announce records that
+        are due together in shared messages. Each record carries its row id, which the bot uses to never post a record
+        it already posted or is still posting twice.
+        The rows are claimed in one transaction and their results saved in another, nothing is held open during the
+        HTTP request. Rows the bot posted are deleted. Failed rows, or every row when the bot can't be reached (it
+        sleeps while idle), are retried with exponential backoff and marked 'dead' after DISCORD_OUTBOX_MAX_ATTEMPTS
+        attempts. Rows the bot is still posting are asked about again after DISCORD_OUTBOX_BASE_DELAY seconds.
+        Claimed rows are skipped by concurrent dispatchers.
+
+    :param session: database connection
+    :param batch_size: maximum number of rows posted per call
+    :return: tuple of (rows sent, rows failed)
+    """
+
+    claimed = _claim_discord_outbox(session, batch_size)
+    if not claimed:
+        return 0, 0
+
+    records = [{'id': notification_id, 'record': json.loads(payload)} for notification_id, payload in claimed]
+
+    try:
+        response = _discord_http.post(f"{DISCORD_BOT_URL}/webhook/new-records", json={'records': records},
+                                      timeout=DISCORD_OUTBOX_HTTP_TIMEOUT)
         if response.status_code == 200:
-            print(f"Discord notification sent successfully: {response.status_code}")
+            results = response.json().get('results') or {}
+            request_error = None
         else:
-            print(f"Discord notification failed: {response.status_code} - {response.text}")
+            results = {}
+            request_error = f"{response.status_code} - {response.text}"
+    except (requests.exceptions.RequestException, ValueError) as e:
+        results = {}
+        request_error = str(e)
+
+    sent_ids = []
+    errors = {}
+    pending_ids = []
+
+    for notification_id, _ in claimed:
+        result = results.get(str(notification_id))
+        if result == 'posted':
+            sent_ids.append(notification_id)
+        elif result == 'pending':
+            pending_ids.append(notification_id)
+        else:
+            errors[notification_id] = request_error or 'Posting to Discord failed'
 
-    except Exception as e:
-        print(f"Failed to notify Discord: {e}")
\ No newline at end of file
+    _record_discord_outbox_results(session, sent_ids, errors, pending_ids)
+
+    return len(sent_ids), len(errors)
@@ -1,43 +1,72 @@
 from flask import request
 from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, asc
+from sqlalchemy import or_, asc, tuple_
 
 from app import app
-from routes.helpers import (ito_api_response, get_single_entry, get_submission_entry, get_all_list,
-                            calculate_timeframe_score)
-from models import Submission, User
+from routes.helpers import (ito_api_response, TIME_FRAMES, normalize_board_params, board_version_name,
+                            conditional_response, get_highlight_snapshot)
+from models import Submission, User, TimeframeScore
+from response_cache import response_cache
+from serializers import (get_single_entry, get_all_list, query_submission_rows, get_submission_row_entry,
+                         get_submission_row_fields, parse_fields_param, project_entry, encode_keyset_cursor,
+                         decode_keyset_cursor, MAX_PAGE_SIZE)
 from session import db_session
 
 @app.route('/api/leaderboard/<game>/<category>/<chapter>/<sub_chapter>', methods=['GET'])
+@conditional_response(counters=lambda game, category, chapter, sub_chapter:
+                      [board_version_name(*normalize_board_params(category, chapter, sub_chapter)), 'users'])
+@response_cache.cached('chapter_leaderboard',
+                       key=lambda game, category, chapter, sub_chapter:
+                       (*normalize_board_params(category, chapter, sub_chapter), game))
 @db_session
 def get_chapter_leaderboard_data(session, game, category, chapter, sub_chapter):
+    """ Runs of a sub_chapter ordered by time, then submission id.
+        Optional query parameters:
+        limit: returns at most limit runs along with a "next" cursor, or None on the last page
+        after: cursor of the previous page, only used together with limit
+        fields: comma separated fields to return for each run, e.g. fields=rank,time_complete,user,user_flag
+    """
 
     try:
 
-        if category == "any":
-            category = "any%"
-        if category == "in_bounds":
-            category = "inbounds"
-
-        sub_chapter = sub_chapter.replace("_", " ")
-        chapter = chapter.replace("_", " ")
-
-        sub_chapter_submissions = (
-            session.query(Submission)
+        category, chapter, sub_chapter = normalize_board_params(category, chapter, sub_chapter)
+
+        try:
+            fields = parse_fields_param(request.args.get('fields'), get_submission_row_fields())
+            limit = request.args.get('limit')
+            limit = min(int(limit), MAX_PAGE_SIZE) if limit is not None else None
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be a positive integer")
+            after = request.args.get('after')
+            after = decode_keyset_cursor(after) if after and limit is not None else None
+        except ValueError as error:
+            return ito_api_response(success=False, message="Invalid query parameters", error=str(error), status_code=400)
+
+        sub_chapter_query = (
+            query_submission_rows(session)
             .filter(Submission.chapter == chapter, Submission.game_title == game, Submission.category == category,
                     Submission.sub_chapter == sub_chapter, Submission.voided == False)
-            .order_by(asc(Submission.time_complete))
-            .options(joinedload(Submission.user))
-            .all()
+            .order_by(asc(Submission.time_complete), asc(Submission.id))
         )
 
-        data = []
+        if limit is None:
+            data = [project_entry(get_submission_row_entry(row), fields) for row in sub_chapter_query.all()]
+            return ito_api_response(success=True, message="Successfully retrieved chapter leaderboard data", data=data, status_code=200)
 
-        for submission in sub_chapter_submissions:
-            submission_data = get_submission_entry(submission)
-            submission_data['user_flag'] = submission.user.flag
-            submission_data['username_color'] = submission.user.username_color
-            data.append(submission_data)
+        if after is not None:
+            sub_chapter_query = sub_chapter_query.filter(tuple_(Submission.time_complete, Submission.id) > tuple_(*after))
+
+        # One extra row tells whether another page follows without a second count query
+        sub_chapter_submissions = sub_chapter_query.limit(limit + 1).all()
+        page = sub_chapter_submissions[:limit]
+        next_cursor = None
+        if len(sub_chapter_submissions) > limit:
+            next_cursor = encode_keyset_cursor(page[-1].time_complete, page[-1].id)
+
+        data = {
+            'runs': [project_entry(get_submission_row_entry(row), fields) for row in page],
+            'next': next_cursor
+        }
 
         return ito_api_response(success=True, message="Successfully retrieved chapter leaderboard data", data=data, status_code=200)
     except Exception as error:
@@ -48,6 +77,7 @@ def get_chapter_leaderboard_data(session, game, category, chapter, sub_chapter):
 
 # TODO: Obsolete route
 @app.route('/api/leaderboard/<game>/<category>', methods=['GET'])
+@conditional_response(counters=lambda game, category: ['submissions', 'scores', 'users'])
 @db_session
 def get_category_leaderboard_data(session, game, category):
 
@@ -81,27 +111,22 @@ def get_category_leaderboard_data(session, game, category):
 
 
 @app.route('/api/leaderboard/recent_runs', methods=['GET'])
+@conditional_response(counters=lambda: ['submissions', 'users'])
+@response_cache.cached('recent_runs')
 @db_session
 def get_recent_runs(session):
 
     try:
 
         submissions = (
-            session.query(Submission)
+            query_submission_rows(session)
             .filter(Submission.voided == False)
             .order_by(Submission.date.desc())
             .limit(3)
-            .options(joinedload(Submission.user))
             .all()
         )
 
-        data = []
-
-        for submission in submissions:
-            submission_data = get_submission_entry(submission)
-            submission_data['user_flag'] = submission.user.flag
-            submission_data['username_color'] = submission.user.username_color
-            data.append(submission_data)
+        data = [get_submission_row_entry(row) for row in submissions]
 
         return ito_api_response(success=True, message="Successfully retrieved most recent runs", data=data, status_code=200)
     except Exception as error:
@@ -114,20 +139,7 @@ def get_recent_runs(session):
 def get_highlights(session):
 
     try:
-        highlighted_submissions = (
-            session.query(Submission)
-            .filter(Submission.highlighted==True)
-            .options(joinedload(Submission.user))
-            .all()
-        )
-
-        data = []
-
-        for submission in highlighted_submissions:
-            submission_data = get_submission_entry(submission)
-            submission_data['user_flag'] = submission.user.flag
-            submission_data['username_color'] = submission.user.username_color
-            data.append(submission_data)
+        data = get_highlight_snapshot(session)
 
         return ito_api_response(success=True, message="Successfully retrieved highlighted submissions", data=data, status_code=200)
 
@@ -138,6 +150,7 @@ def get_highlights(session):
 
 
 @app.route('/api/leaderboard/users/<category>/<time_frame>', methods=['GET'])
+@conditional_response(counters=lambda category, time_frame: ['scores', 'timeframe_scores', 'users'])
 @db_session
 def get_user_leaderboard_data(session, category, time_frame):
 
@@ -153,21 +166,33 @@ def get_user_leaderboard_data(session, category, time_frame):
             category = "main board"
             category_filter = or_()
 
-        verified_users = (
-            session.query(User)
+        if time_frame not in TIME_FRAMES:
+            time_frame = 'all_time'
+
+        # Every verified user has a row on each board, so the board is read in ix_timeframe_score_board order
+        # and the users are looked up by id
+        leaderboard_query = (
+            session.query(User, TimeframeScore.score)
+            .select_from(TimeframeScore)
+            .join(User, User.id == TimeframeScore.user_id)
+            .filter(TimeframeScore.category == category, TimeframeScore.time_frame == time_frame)
             .filter(User.role >= 1)
             .filter(category_filter)
-            .all()
+            .order_by(TimeframeScore.score.desc(), TimeframeScore.user_id.asc())
         )
 
+        page = request.args.get('page', type=int)
+        per_page = request.args.get('per_page', type=int)
+
+        if page and per_page and page > 0 and per_page > 0:
+            leaderboard_query = leaderboard_query.offset((page - 1) * per_page).limit(per_page)
+
         response_data = []
-        for user in verified_users:
+        for user, user_timeframe_score in leaderboard_query.all():
             user_data = get_single_entry(user)
-            user_data['timeframe_score'] = calculate_timeframe_score(user, time_frame, category)
+            user_data['timeframe_score'] = user_timeframe_score
             response_data.append(user_data)
 
-        response_data.sort(key=lambda x: x['timeframe_score'], reverse=True)
-
         return ito_api_response(success=True, message="Successfully retrieved user leaderboard", data=response_data, status_code=200)
 
     except Exception as error:
@@ -176,6 +201,8 @@ def get_user_leaderboard_data(session, category, time_frame):
 
 
 @app.route('/api/leaderboard/users/total', methods=['GET'])
+@conditional_response(counters=lambda: ['scores', 'users'])
+@response_cache.cached('user_total_leaderboard')
 @db_session
 def get_user_total_leaderboard_data(session):
 
@@ -3,18 +3,51 @@ from flask import request, send_from_directory
 from sqlalchemy.orm import joinedload
 from sqlalchemy import func
 import datetime
-import json
+import copy
 import re
 import os
 
 from app import app
-from routes.helpers import ito_api_response, get_single_entry, get_submission_entry, update_submission_rankings, \
-    update_player_scores, get_all_list, calculate_timeframe_score
+from routes.helpers import ito_api_response, update_submission_rankings, update_player_scores, conditional_response, \
+    season_version_name, get_versions, get_league_top_runs
+from serializers import get_submission_entry
 from models import Submission, User, LeagueRun
+from season_registry import SeasonRegistry
 from session import db_session
 
 BASE_DIR = 'league_resources'
 
+# Built when the routes are imported at startup
+season_registry = SeasonRegistry(BASE_DIR)
+season_registry.refresh()
+
+# Top runs of every week and level by season, as (change counter versions, runs), rebuilt when the counters change
+_season_top_runs = {}
+
+
+def _season_etag(season, *keys):
+    """ ETag part for the loaded files of a season, or for its absence. """
+    league_season = season_registry.get(season)
+    return [league_season.etag_part(*keys) if league_season else f'{season}=missing']
+
+
+def _get_season_top_runs(session, season):
+    """ Top three runs of every week and level of a season, queried again only after update_league_rankings ran for
+        the season or a user changed their profile.
+    """
+
+    counter_names = [season_version_name(season), 'users']
+    versions = get_versions(session, counter_names)
+    versions = tuple(versions[name] for name in counter_names)
+
+    cached = _season_top_runs.get(season)
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+
+    top_runs = get_league_top_runs(session, season, limit=3)
+    _season_top_runs[season] = (versions, top_runs)
+    return top_runs
+
 
 @app.route('/api/league_resources/images/<path:filename>')
 def serve_season_images(filename):
@@ -27,39 +60,30 @@ def serve_season_badges(filename):
     return send_from_directory(resources_dir, filename)
 
 @app.route('/api/leagues/buttons/<season>', methods=['GET'])
+@conditional_response(counters=lambda season: [season_version_name(season), 'users'],
+                      tags=lambda season: _season_etag(season, 'button_data'))
 @db_session
 def get_buttons_leaderboard(session, season):
     try:
-        matched_dir = next(d for d in os.listdir(BASE_DIR) if d.endswith(f'_{season}') or d == season)
-        button_data_fp = f'{BASE_DIR}/{matched_dir}/button_data.json'
-
-        with open(button_data_fp, 'r') as button_data_file:
-            button_data = json.load(button_data_file)
+        league_season = season_registry.get(season)
+        if league_season is None or league_season.button_data is None:
+            return ito_api_response(success=False, message=f"Season {season} does not exist", status_code=404)
 
-        data_to_return = button_data
+        data_to_return = copy.deepcopy(league_season.button_data)
+        top_runs = _get_season_top_runs(session, season)
 
         for week in data_to_return:
             if "week" not in week:
                 continue
 
-            for level in data_to_return[week]['levels']:
-                level_key = int(level)
-                week_key = int(re.search(r'\d+', week).group())
-
-                top_three_runs = (
-                    session.query(LeagueRun)
-                    .options(joinedload(LeagueRun.user))
-                    .filter(LeagueRun.week == week_key, LeagueRun.level == level_key, LeagueRun.season == season)
-                    .order_by(LeagueRun.time_complete.asc())
-                    .limit(3)
-                    .all()
-                )
+            week_key = int(re.search(r'\d+', week).group())
 
-                list_of_players = []
-                for run in top_three_runs:
-                    list_of_players.append(get_submission_entry(run))
+            for level in data_to_return[week]['levels']:
+                top_three_runs = top_runs.get((week_key, int(level)))
 
-                    data_to_return[week]['levels'][level]['players'] = list_of_players
+                # Levels without runs have no players key
+                if top_three_runs:
+                    data_to_return[week]['levels'][level]['players'] = copy.deepcopy(top_three_runs)
 
         return ito_api_response(success=True, status_code=200, data=data_to_return, message='success')
 
@@ -70,6 +94,7 @@ def get_buttons_leaderboard(session, season):
 
 
 @app.route('/api/leagues/<season>/<week>/<level>', methods=['GET'])
+@conditional_response(counters=lambda season, week, level: [season_version_name(season), 'users'])
 @db_session
 def get_leagues_leaderboard(session, season, week, level):
 
@@ -101,6 +126,7 @@ def get_leagues_leaderboard(session, season, week, level):
 
 
 @app.route('/api/leagues/<season>', methods=['GET'])
+@conditional_response(counters=lambda season: [season_version_name(season), 'users'])
 @db_session
 def get_leagues_total_leaderboard(session, season):
 
@@ -140,14 +166,16 @@ def get_leagues_total_leaderboard(session, season):
                                 status_code=500, error=str(e))
 
 @app.route('/api/leagues/<season>/results', methods=['GET'])
+@conditional_response(tags=lambda season: _season_etag(season, 'bracket_results'))
 def get_leagues_results(season):
 
     try:
-        results_json_fp = f'{BASE_DIR}/{season}/bracket_results.json'
-        with open(results_json_fp, 'r') as f:
-            results_json = json.load(f)
+        league_season = season_registry.get(season)
+        if league_season is None or league_season.bracket_results is None:
+            return ito_api_response(success=False, message=f"No results for season {season}", status_code=404)
 
-        return ito_api_response(success=True, status_code=200, data=results_json.get('data'), message='success')
+        return ito_api_response(success=True, status_code=200, data=league_season.bracket_results.get('data'),
+                                message='success')
     except Exception as e:
         print(e)
         return ito_api_response(success=False, message=f"Failed on {request.method} to {request.endpoint}",
@@ -155,17 +183,11 @@ def get_leagues_results(season):
 
 
 @app.route('/api/leagues/all_seasons', methods=['GET'])
+@conditional_response(tags=lambda: [season_registry.etag_part()])
 def get_leagues_seasons():
 
     try:
-        dirs = os.listdir(BASE_DIR)
-
-        seasons = []
-
-        for directory in dirs:
-            if directory == 'images' or directory == 'badges':
-                continue
-            seasons.append(directory.split('_', 1)[1])
+        seasons = [league_season.short_name for league_season in season_registry.seasons()]
 
         return ito_api_response(success=True, status_code=200, data=seasons, message='success')
 
@@ -6,10 +6,15 @@ import json
 from sqlalchemy.orm import joinedload
 
 from app import app
-from routes.helpers import ito_api_response, get_single_entry, get_submission_entry, update_submission_rankings, \
-    update_player_scores, get_all_list, convert_time_to_int
+from routes.helpers import ito_api_response, update_submission_rankings, update_player_scores, convert_time_to_int, \
+    invalidate_board_responses, bump_versions, board_version_name, conditional_response, build_highlight_snapshot, \
+    update_timeframe_scores
 from routes.auth_routes import token_auth
 from models import Submission, User
+from response_cache import response_cache
+from serializers import get_single_entry, get_submission_entry, get_all_list
+from token_cache import token_cache
+from password_pool import password_pool
 from session import db_session
 
 GAME_DATA_FP = 'game_data.json'
@@ -40,8 +45,14 @@ def report_submission(session):
         submission_to_report.reported_by = curr_user.id
         submission_to_report.reported_date = datetime.datetime.now()
 
+        # Recent runs show the reported flag
+        bump_versions(session, board_version_name(submission_to_report.category, submission_to_report.chapter,
+                                                  submission_to_report.sub_chapter), 'submissions')
         session.commit()
 
+        invalidate_board_responses(submission_to_report.category, submission_to_report.chapter,
+                                   submission_to_report.sub_chapter)
+
 
 
         return ito_api_response(success=True, message="Successfully reported submission", status_code=200)
@@ -106,8 +117,14 @@ def restore_submission(session):
         submission_to_restore.reported_by = None
         submission_to_restore.reported_date = None
 
+        # Recent runs show the reported flag
+        bump_versions(session, board_version_name(submission_to_restore.category, submission_to_restore.chapter,
+                                                  submission_to_restore.sub_chapter), 'submissions')
         session.commit()
 
+        invalidate_board_responses(submission_to_restore.category, submission_to_restore.chapter,
+                                   submission_to_restore.sub_chapter)
+
         return ito_api_response(success=True, message="Successfully restored submission", status_code=200)
 
 
@@ -140,11 +157,14 @@ def remove_submission(session):
             return ito_api_response(success=False, message="This submission has not been reported", status_code=400)
 
         session.delete(submission_to_remove)
+        if submission_to_remove.highlighted:
+            build_highlight_snapshot(session)
         session.commit()
 
         update_submission_rankings(session, submission_to_remove.category, submission_to_remove.chapter,
                                    submission_to_remove.sub_chapter)
-        update_player_scores(session)
+        update_player_scores(session, submission_to_remove.category, submission_to_remove.chapter,
+                             submission_to_remove.sub_chapter, user_ids=[submission_to_remove.user_id])
 
         return ito_api_response(success=True, message="Successfully removed submission", status_code=200)
 
@@ -198,8 +218,14 @@ def verify_user(session):
             return ito_api_response(success=False, message="This user does not exist", status_code=404)
 
         user_to_verify.role = 1
+        # The user leaderboards only list users with timeframe_score rows
+        update_timeframe_scores(session, [user_to_verify.id])
+        bump_versions(session, 'users')
         session.commit()
 
+        response_cache.invalidate('user_total_leaderboard')
+        token_cache.invalidate_users([user_to_verify.id])
+
         return ito_api_response(success=True, message="Successfully verified user", status_code=200)
 
     except Exception as error:
@@ -228,8 +254,12 @@ def deny_user(session):
             return ito_api_response(success=False, message="This user does not exist", status_code=404)
 
         user_to_deny.role = -1
+        bump_versions(session, 'users')
         session.commit()
 
+        response_cache.invalidate('user_total_leaderboard')
+        token_cache.invalidate_users([user_to_deny.id])
+
         return ito_api_response(success=True, message="Successfully rejected user", status_code=200)
 
     except Exception as error:
@@ -292,7 +322,10 @@ def mod_create_submission(session):
         session.commit()
 
         update_submission_rankings(session, category, chapter, sub_chapter)
-        update_player_scores(session)
+        update_player_scores(session, category, chapter, sub_chapter)
+
+        # The commit in update_player_scores expired the submission, reload it with its rank and points
+        session.refresh(new_user_submission)
 
         return ito_api_response(success=True, data=get_single_entry(new_user_submission), message='Submission created',
                                 status_code=200)
@@ -303,6 +336,7 @@ def mod_create_submission(session):
 
 
 @app.route('/api/game/data', methods=['GET'])
+@conditional_response(files=lambda: [GAME_DATA_FP])
 def get_game_data():
 
     try:
@@ -338,3 +372,28 @@ def edit_game_data():
     except Exception as error:
         print(error)
         return ito_api_response(success=False, message=f"Failed to update game data", error=str(error), status_code=500)
+
+
+@app.route('/api/mod/stats', methods=['GET'])
+@authenticate(token_auth)
+def get_worker_stats():
+    """ Counters of the worker answering the request, each gunicorn worker keeps its own. """
+
+    try:
+
+        curr_user = token_auth.current_user()
+
+        if curr_user.role != 2:
+            return ito_api_response(success=False, message="You are not authorized to perform this action", status_code=403)
+
+        data = {
+            'password_pool': password_pool.stats(),
+            'response_cache': response_cache.stats(),
+        }
+
+        return ito_api_response(success=True, message="Successfully retrieved worker stats", data=data, status_code=200)
+
+    except Exception as error:
+        print(error)
+        return ito_api_response(success=False, message=f"Failed on {request.method} to {request.endpoint}",
+                                error=str(error), status_code=500)
@@ -0,0 +1,149 @@
+import threading
+import time
+import json
+import os
+import re
+
+# How often a worker checks league_resources for changed files, in seconds
+SEASON_REFRESH_INTERVAL = int(os.getenv('SEASON_REFRESH_INTERVAL', '5'))
+
+# Season directories are named <number>_<short name>, e.g. 1_su_25
+SEASON_DIR_PATTERN = re.compile(r'^(\d+)_(.+)$')
+
+SEASON_FILES = {'button_data': 'button_data.json', 'bracket_results': 'bracket_results.json'}
+
+
+def _file_version(path):
+    """ (mtime, size) of a file, None when it doesn't exist. """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Season:
+    """ A season directory of league_resources with its JSON files parsed. A missing or unreadable file is None. """
+
+    def __init__(self, number, season_id, short_name, path):
+        self.number = number
+        self.id = season_id
+        self.short_name = short_name
+        self.path = path
+        self.file_versions = {}
+        self.button_data = None
+        self.bracket_results = None
+
+    def etag_part(self, *keys):
+        """ Versions of the given files as loaded, for the ETag of responses built from them. """
+
+        return f'{self.id}:' + ','.join(f'{key}={self.file_versions.get(key)}' for key in keys)
+
+
+class SeasonRegistry:
+    """ Seasons of a league_resources directory indexed by id (1_su_25) and short name (su_25), with their JSON files
+        kept parsed in memory. Each worker builds its own registry at startup and re-checks the modification times at
+        most every refresh_interval seconds when it is read, re-parsing only the files that changed.
+    """
+
+    def __init__(self, base_dir, refresh_interval=SEASON_REFRESH_INTERVAL):
+        self.base_dir = base_dir
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self._seasons = []
+        self._seasons_by_key = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """ Rescans base_dir and reloads the files whose modification time or size changed. Bumps version when any
+            season or file changed.
+        """
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+
+            try:
+                dirs = os.listdir(self.base_dir)
+            except OSError as error:
+                print(f"Failed to read seasons from {self.base_dir}: {error}")
+                dirs = []
+
+            previous = {season.id: season for season in self._seasons}
+            seasons = []
+            changed = False
+
+            for directory in dirs:
+                match = SEASON_DIR_PATTERN.match(directory)
+                path = os.path.join(self.base_dir, directory)
+                if not match or not os.path.isdir(path):
+                    continue
+
+                season = previous.get(directory) or Season(int(match.group(1)), directory, match.group(2), path)
+                changed |= self._load_files(season) or directory not in previous
+                seasons.append(season)
+
+            changed |= len(seasons) != len(previous)
+            seasons.sort(key=lambda season: season.number)
+
+            seasons_by_key = {}
+            for season in seasons:
+                seasons_by_key[season.short_name] = season
+            for season in seasons:
+                seasons_by_key[season.id] = season
+
+            self._seasons = seasons
+            self._seasons_by_key = seasons_by_key
+            if changed:
+                self.version += 1
+
+    @staticmethod
+    def _load_files(season):
+        """ Parses the season's files that changed since they were last loaded, returns whether any did. """
+
+        changed = False
+
+        for key, filename in SEASON_FILES.items():
+            file_path = os.path.join(season.path, filename)
+            file_version = _file_version(file_path)
+            if file_version == season.file_versions.get(key):
+                continue
+
+            data = None
+            if file_version is not None:
+                try:
+                    with open(file_path, 'r') as season_file:
+                        data = json.load(season_file)
+                except (OSError, ValueError) as error:
+                    # Keep the previous contents of a file that is being rewritten and retry on the next refresh
+                    print(f"Failed to load {file_path}: {error}")
+                    continue
+
+            setattr(season, key, data)
+            season.file_versions[key] = file_version
+            changed = True
+
+        return changed
+
+    def _refresh_if_due(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            self.refresh()
+
+    def get(self, season):
+        """ Season by id or short name, None when it doesn't exist. """
+
+        self._refresh_if_due()
+        return self._seasons_by_key.get(season)
+
+    def seasons(self):
+        """ Every season ordered by number. """
+
+        self._refresh_if_due()
+        return list(self._seasons)
+
+    def etag_part(self):
+        """ Version of the season list, for the ETag of responses listing the seasons. """
+
+        self._refresh_if_due()
+        return f'seasons={self.version}'
@@ -0,0 +1,218 @@
+from sqlalchemy import inspect, DateTime
+from models import Submission, User
+
+# Largest page a paginated leaderboard request may ask for
+MAX_PAGE_SIZE = 500
+
+
+def convert_int_to_time(time_int):
+    """ Converts an integer queried from the database and formats it into a time string following MM:ss.mmm format.
+
+    :param time_int: integer queried from the database
+    :return: String
+    """
+
+    milliseconds = time_int % 1000
+    time_int //= 1000
+    seconds = time_int % 60
+    time_int //= 60
+    minutes = time_int
+
+    return f'{minutes}:{seconds:02d}.{milliseconds:03d}'
+
+
+def _to_timestamp(value):
+    return value.timestamp() if value is not None else None
+
+
+def _to_time_string(value):
+    return convert_int_to_time(value) if value is not None else None
+
+
+class ModelSerializer:
+    """ Column keys and value converters of a model, compiled once and reused for every row.
+        Only mapped columns are serialized, relationships never leak into the output.
+    """
+
+    def __init__(self, model, convert_time):
+        column_attrs = inspect(model).column_attrs
+
+        self.columns = [getattr(model, attr.key) for attr in column_attrs]
+        self.fields = []
+        for attr in column_attrs:
+            if isinstance(attr.columns[0].type, DateTime):
+                converter = _to_timestamp
+            elif convert_time and attr.key == 'time_complete':
+                converter = _to_time_string
+            else:
+                converter = None
+            self.fields.append((attr.key, converter))
+
+    def from_instance(self, record):
+        """ Serializes the loaded columns of an ORM object without triggering any lazy loads. """
+
+        values = record.__dict__
+        return {key: values[key] if converter is None else converter(values[key])
+                for key, converter in self.fields if key in values}
+
+    def from_row(self, row):
+        """ Serializes a row queried with self.columns, ignoring any extra trailing columns. """
+
+        return {key: value if converter is None else converter(value)
+                for (key, converter), value in zip(self.fields, row)}
+
+
+_serializers = {}
+
+
+def get_serializer(model, convert_time=True):
+    """ Returns the cached ModelSerializer for a model.
+
+    :param model: mapped class to serialize
+    :param convert_time: whether time_complete is converted to a M:SS.mmm string
+    :return: ModelSerializer
+    """
+
+    serializer = _serializers.get((model, convert_time))
+    if serializer is None:
+        serializer = _serializers[(model, convert_time)] = ModelSerializer(model, convert_time)
+    return serializer
+
+
+def get_all_list(entries):
+    """ The return value of query.all() is not JSON serializable.
+        This requires adding each entry retrieved from the database to be added into a List which is JSON serializable
+        and therefore presentable to the user.
+
+    :param entries: session query of the entries in the database.
+    :return list: List containing each entry of the requested data
+    """
+
+    return [get_serializer(type(record)).from_instance(record) for record in entries]
+
+def get_single_entry(single_entry):
+    """ The return value of query.get() is not JSON serializable.
+        This requires adding the single entry to a Dictionary which is JSON serializable.
+
+    :param single_entry: session query of an entry in the database
+    :return dict: Dictionary containing a single database entry
+    """
+
+    if single_entry is None:
+        return None
+    return get_serializer(type(single_entry), convert_time=False).from_instance(single_entry)
+
+
+def get_submission_entry(single_entry):
+    """ Revised version of get_single_entry. Handles adding the user's username to the submission and converting the
+        time back to a string.
+
+    :param single_entry: session query of an entry in the database
+    :return dict: Dictionary containing a single database entry
+    """
+
+    if single_entry is None:
+        return None
+    single_record = get_serializer(type(single_entry)).from_instance(single_entry)
+    if 'user' in single_entry.__dict__:
+        single_record['user'] = single_entry.user.username if single_entry.user else None
+    return single_record
+
+
+def query_submission_rows(session):
+    """ Query of every submission column plus the submitter's username, flag and username color as plain rows, without
+        building ORM objects. Serialize the rows with get_submission_row_entry.
+
+    :param session: database connection
+    :return: query to add filters and ordering to
+    """
+
+    return (
+        session.query(*get_serializer(Submission).columns, User.username, User.flag, User.username_color)
+        .outerjoin(User, Submission.user_id == User.id)
+    )
+
+
+def get_submission_row_entry(row):
+    """ Row version of get_submission_entry for rows from query_submission_rows, also adding the user's flag and
+        username color.
+
+    :param row: row returned by query_submission_rows
+    :return dict: Dictionary containing a single submission
+    """
+
+    single_record = get_serializer(Submission).from_row(row)
+    single_record['user'], single_record['user_flag'], single_record['username_color'] = row[-3:]
+    return single_record
+
+
+def get_submission_row_fields():
+    """ Keys of the dictionaries built by get_submission_row_entry, the fields a leaderboard can be projected on. """
+
+    return [key for key, converter in get_serializer(Submission).fields] + ['user', 'user_flag', 'username_color']
+
+
+def parse_fields_param(fields_param, allowed_fields):
+    """ Parses a comma separated fields= query parameter.
+
+    :param fields_param: raw parameter value, None when the parameter is absent
+    :param allowed_fields: fields the response can contain
+    :return: list of requested fields, None when every field is requested
+    :raises ValueError: when a requested field does not exist
+    """
+
+    if not fields_param:
+        return None
+
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown_fields = [field for field in fields if field not in allowed_fields]
+    if unknown_fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}")
+
+    return fields
+
+
+def project_entry(entry, fields):
+    """ Keeps only the requested fields of a serialized entry, returning it unchanged when fields is None. """
+
+    if fields is None:
+        return entry
+    return {field: entry[field] for field in fields}
+
+
+def encode_keyset_cursor(time_complete, submission_id):
+    """ Cursor pointing after a run of a leaderboard ordered by time_complete then id, formatted "time_complete:id". """
+
+    return f'{time_complete}:{submission_id}'
+
+
+def decode_keyset_cursor(cursor):
+    """ Reverse of encode_keyset_cursor.
+
+    :param cursor: "time_complete:id" string sent back by the client
+    :return: (time_complete, id) tuple
+    :raises ValueError: when the cursor is malformed
+    """
+
+    time_complete, separator, submission_id = cursor.partition(':')
+    if not separator:
+        raise ValueError("Malformed cursor")
+
+    return int(time_complete), int(submission_id)
+
+
+def get_account_entry(user_entry):
+    """ Revised version of get_single_entry.
+        This version of the function also handles user submissions and makes them JSON serializable without having
+        to query the submissions in a second database query.
+
+    :param user_entry: session query of a user in the database
+    :return dict: Dictionary containing information about the requested user
+    """
+
+    if user_entry is None:
+        return None
+    single_record = get_single_entry(user_entry)
+    if 'submissions' in user_entry.__dict__:
+        single_record['submissions'] = [get_submission_entry(submission) for submission in user_entry.submissions]
+    return single_record
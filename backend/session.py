@@ -1,27 +1,113 @@
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
+from flask import g, has_request_context
 from models import Base
 import os
 import functools
+import threading
 
 # DB_URL = os.getenv('DB_TEST_STRING')
 DB_URL = os.getenv('DB_STRING')
 API_KEY = os.getenv('SECRET_KEY')
 
-engine = sqlalchemy.create_engine(DB_URL)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+
+def engine_options(db_url):
+    """ Connection pool settings for the engine. SQLite doesn't use a sized queue pool, so only the options every pool
+        accepts are passed for it.
+
+    :param db_url: database connection string
+    :return: keyword arguments for sqlalchemy.create_engine
+    """
+
+    options = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_recycle': DB_POOL_RECYCLE}
+
+    if not db_url.startswith('sqlite'):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+    return options
+
+
+# Tables are normally created and updated by the Alembic migrations, set DB_CREATE_ALL=false to skip checking for
+# missing tables when the engine is created
+DB_CREATE_ALL = os.getenv('DB_CREATE_ALL', 'true').lower() in ('1', 'true', 'yes')
+
 Session = sqlalchemy.orm.sessionmaker()
-Session.configure(bind=engine)
 
-Base.metadata.create_all(engine)
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """ Creates the engine on first use, so importing this module never connects to the database. """
+
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                db_url = os.getenv('DB_STRING', DB_URL)
+                engine = sqlalchemy.create_engine(db_url, **engine_options(db_url))
+                Session.configure(bind=engine)
+
+                if DB_CREATE_ALL:
+                    Base.metadata.create_all(engine)
+
+                _engine = engine
+
+    return _engine
+
+
+def create_session():
+    """ Opens a new session, creating the engine if this is the first one. """
+
+    get_engine()
+    return Session()
+
+
+def get_request_session():
+    """ Session shared by everything that runs during the current Flask request (auth callbacks, ETag checks and the
+        route itself), so a request checks out a single connection. It is closed by close_request_session.
+    """
+
+    if 'db_session' not in g:
+        g.db_session = create_session()
+    return g.db_session
+
+
+def close_request_session(error=None):
+    """ Teardown handler closing the request's session, rolling back first if the request raised. """
+
+    session = g.pop('db_session', None)
+    if session is None:
+        return
+
+    try:
+        if error is not None:
+            session.rollback()
+    finally:
+        session.close()
+
 
 def db_session(func):
     @functools.wraps(func)
     def session_handler(*args, **kwargs):
-        session = Session()
-
-        value = func(*args, **kwargs, session=session)
+        if has_request_context():
+            return func(*args, **kwargs, session=get_request_session())
 
-        session.close()
-        return value
+        # Scheduler jobs and scripts run outside of a request and get their own session
+        session = create_session()
+        try:
+            return func(*args, **kwargs, session=session)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
-    return session_handler
\ No newline at end of file
+    return session_handler
@@ -0,0 +1,141 @@
+import contextlib
+import datetime
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app reads its settings when it is imported, and league_resources and game_data.json are relative paths
+_db_dir = tempfile.mkdtemp(prefix='ito-tests-')
+os.environ['DB_STRING'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-for-the-backend-tests')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+# Scheduled jobs would write to the test database from another thread while the tests count queries
+import highlight_scheduler
+highlight_scheduler.setup_highlight_scheduler = lambda: None
+
+from sqlalchemy import event
+from app import app as flask_app
+from models import Base, User, Submission, LeagueRun, Leaderboard
+from response_cache import response_cache
+from token_cache import token_cache
+import routes.helpers as helpers
+import routes.league_routes as league_routes
+import session as session_module
+
+
+@pytest.fixture
+def engine():
+    return session_module.get_engine()
+
+
+@pytest.fixture(autouse=True)
+def clean_database(engine):
+    """ Every test starts from empty tables and empty per-worker caches. """
+
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+    response_cache.clear()
+    token_cache.clear()
+    helpers._highlight_snapshot = (None, None)
+    league_routes._season_top_runs.clear()
+
+    yield
+
+
+@pytest.fixture
+def client():
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def session():
+    db = session_module.create_session()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def count_queries(engine):
+    """ Context manager collecting the SQL statements run on the engine while it is open. """
+
+    @contextlib.contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return counter
+
+
+@pytest.fixture
+def make_user(session):
+    def make(username, password='password', role=1, **columns):
+        user = User(username=username, email=f'{username}@example.com', role=role, flag='us', lb_pref=3, score=0,
+                    creation_date=datetime.datetime.now(), **columns)
+        user.generate_password_hash(password)
+        session.add(user)
+        session.commit()
+        return user
+
+    return make
+
+
+@pytest.fixture
+def make_submission(session):
+    def make(user, time_complete, category='any%', chapter='chapter', sub_chapter='sub', rank_board=True, **columns):
+        columns.setdefault('date', datetime.datetime.now())
+        columns.setdefault('voided', False)
+        columns.setdefault('reported', False)
+        columns.setdefault('highlighted', False)
+        submission = Submission(user_id=user.id, time_complete=time_complete, category=category, chapter=chapter,
+                                sub_chapter=sub_chapter, game_title='itt', video_url='https://example.com/run',
+                                **columns)
+        session.add(submission)
+        session.commit()
+
+        if rank_board:
+            helpers.update_submission_rankings(session, category, chapter, sub_chapter)
+        return submission
+
+    return make
+
+
+@pytest.fixture
+def make_league_run(session):
+    def make(user, season, week, level, time_complete):
+        run = LeagueRun(user_id=user.id, season=season, week=week, level=level, time_complete=time_complete,
+                        video_url='https://example.com/run', date=datetime.datetime.now())
+        session.add(run)
+        session.commit()
+        return run
+
+    return make
+
+
+@pytest.fixture
+def login(client):
+    """ Logs a user in and returns their encoded access and refresh tokens. """
+
+    def log_in(username, password='password'):
+        response = client.post('/api/tokens/create', auth=(username, password))
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        return data['access_token'], data['refresh_token']
+
+    return log_in
@@ -0,0 +1,60 @@
+import pytest
+
+URL = '/api/leaderboard/itt/any/chapter/sub'
+
+
+@pytest.fixture
+def tied_board(make_user, make_submission):
+    """ Seven runs where most times are tied, returning their ids in leaderboard order (time, then id). """
+
+    runs = [make_submission(make_user(f'runner{number}'), time_complete)
+            for number, time_complete in enumerate((2000, 1000, 1000, 3000, 2000, 1000, 2000))]
+    return [run.id for run in sorted(runs, key=lambda run: (run.time_complete, run.id))]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 10])
+def test_pages_cover_every_run_once_across_tied_times(client, tied_board, limit):
+    page_ids = []
+    cursor = None
+
+    for _ in range(len(tied_board) + 1):
+        query_string = {'limit': limit, 'after': cursor} if cursor else {'limit': limit}
+        response = client.get(URL, query_string=query_string)
+        assert response.status_code == 200
+
+        data = response.get_json()['data']
+        assert 0 < len(data['runs']) <= limit
+        page_ids.extend(run['id'] for run in data['runs'])
+        cursor = data['next']
+        if cursor is None:
+            break
+
+    assert page_ids == tied_board
+    assert [run['id'] for run in client.get(URL).get_json()['data']] == tied_board
+
+
+def test_fields_project_every_run(client, tied_board):
+    response = client.get(URL, query_string={'fields': 'id,rank,user', 'limit': 2})
+
+    assert response.status_code == 200
+    runs = response.get_json()['data']['runs']
+    assert [sorted(run) for run in runs] == [['id', 'rank', 'user'], ['id', 'rank', 'user']]
+    assert [(run['id'], run['rank']) for run in runs] == [(tied_board[0], 1), (tied_board[1], 1)]
+
+    unpaged = client.get(URL, query_string={'fields': 'user_flag'}).get_json()['data']
+    assert unpaged == [{'user_flag': 'us'}] * len(tied_board)
+
+
+@pytest.mark.parametrize('query_string', [
+    {'limit': 2, 'after': 'not-a-cursor'},
+    {'limit': 2, 'after': '1000:abc'},
+    {'limit': 0},
+    {'limit': -3},
+    {'limit': 'ten'},
+    {'fields': 'rank,password'},
+])
+def test_invalid_query_parameters_are_rejected(client, tied_board, query_string):
+    response = client.get(URL, query_string=query_string)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
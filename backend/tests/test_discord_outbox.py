@@ -0,0 +1,120 @@
+import datetime
+import json
+
+import pytest
+import requests
+
+import routes.helpers as helpers
+from models import DiscordOutbox
+
+
+class FakeResponse:
+    def __init__(self, status_code, results=None, body=''):
+        self.status_code = status_code
+        self.results = results
+        self.text = body
+
+    def json(self):
+        return {'results': self.results}
+
+
+class FakeBot:
+    """ Stands in for the HTTP session posting to the bot, answering with the queued responses in order. """
+
+    def __init__(self, engine, responses):
+        self.engine = engine
+        self.responses = list(responses)
+        self.posted = []
+        self.connections_held = []
+
+    def post(self, url, json=None, timeout=None):
+        self.connections_held.append(self.engine.pool.checkedout())
+        self.posted.append(json['records'])
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def queue_records(session):
+    def queue(count, **columns):
+        for number in range(count):
+            helpers.queue_discord_notification(session, {'username': f'runner{number}'})
+        session.commit()
+        if columns:
+            session.query(DiscordOutbox).update(columns)
+            session.commit()
+        notification_ids = [notification_id for notification_id, in
+                            session.query(DiscordOutbox.id).order_by(DiscordOutbox.id)]
+        # Leaves no connection checked out, so the dispatcher's are the only ones counted
+        session.commit()
+        return notification_ids
+
+    return queue
+
+
+def dispatch(monkeypatch, engine, responses):
+    fake_bot = FakeBot(engine, responses)
+    monkeypatch.setattr(helpers, '_discord_http', fake_bot)
+
+    from session import create_session
+    dispatcher_session = create_session()
+    try:
+        return fake_bot, helpers.dispatch_discord_outbox(dispatcher_session)
+    finally:
+        dispatcher_session.close()
+
+
+def test_posts_the_batch_in_one_request_without_holding_a_connection(monkeypatch, engine, session, queue_records):
+    sent_id, failed_id, pending_id = queue_records(3)
+    results = {str(sent_id): 'posted', str(failed_id): 'failed', str(pending_id): 'pending'}
+
+    fake_bot, (sent, failed) = dispatch(monkeypatch, engine, [FakeResponse(200, results)])
+
+    assert (sent, failed) == (1, 1)
+    assert fake_bot.connections_held == [0]
+    assert [record['id'] for record in fake_bot.posted[0]] == [sent_id, failed_id, pending_id]
+    assert fake_bot.posted[0][0]['record'] == {'username': 'runner0'}
+
+    session.expire_all()
+    assert session.get(DiscordOutbox, sent_id) is None
+
+    failed_row = session.get(DiscordOutbox, failed_id)
+    assert (failed_row.status, failed_row.attempts) == ('pending', 1)
+    assert failed_row.next_attempt_at > datetime.datetime.now()
+
+    # Still being posted by the bot, asked about again later without counting an attempt
+    pending_row = session.get(DiscordOutbox, pending_id)
+    assert (pending_row.status, pending_row.attempts) == ('sending', 0)
+    assert pending_row.next_attempt_at > datetime.datetime.now()
+
+
+def test_unreachable_bot_retries_every_row_with_backoff(monkeypatch, engine, session, queue_records):
+    notification_ids = queue_records(3)
+
+    fake_bot, (sent, failed) = dispatch(monkeypatch, engine, [requests.exceptions.ConnectionError('asleep')])
+
+    assert (sent, failed) == (0, 3)
+    assert len(fake_bot.posted) == 1
+
+    session.expire_all()
+    for notification_id in notification_ids:
+        row = session.get(DiscordOutbox, notification_id)
+        assert (row.status, row.attempts, row.last_error) == ('pending', 1, 'asleep')
+        assert row.next_attempt_at > datetime.datetime.now()
+
+
+def test_claimed_rows_are_skipped_until_the_claim_expires(monkeypatch, engine, session, queue_records):
+    future = datetime.datetime.now() + datetime.timedelta(minutes=5)
+    notification_id, = queue_records(1, status='sending', next_attempt_at=future)
+
+    fake_bot, _ = dispatch(monkeypatch, engine, [])
+    assert fake_bot.posted == []
+
+    session.query(DiscordOutbox).update({DiscordOutbox.next_attempt_at: datetime.datetime.now()})
+    session.commit()
+
+    fake_bot, (sent, failed) = dispatch(monkeypatch, engine, [FakeResponse(200, {str(notification_id): 'posted'})])
+    assert (sent, failed) == (1, 0)
+    assert session.query(DiscordOutbox).count() == 0
@@ -0,0 +1,172 @@
+import asyncio
+import math
+
+import pytest
+
+pytest.importorskip('discord')
+import discord
+from aiohttp.test_utils import TestClient, TestServer
+
+import app_discord_bot
+from discord_bot import RecordNotifier
+
+
+class FakeBot:
+    def is_ready(self):
+        return True
+
+
+class SlowNotifier(RecordNotifier):
+    """ RecordNotifier whose Discord messages take post_seconds to send, recording the embeds of each message. """
+
+    def __init__(self, post_seconds, coalesce_seconds=0.05):
+        super().__init__(FakeBot(), coalesce_seconds=coalesce_seconds)
+        self.post_seconds = post_seconds
+        self.messages = []
+
+    def queue_record(self, record_data, thread_id=1):
+        # DISCORD_THREAD_ID isn't configured here, records would each create a forum thread instead
+        return super().queue_record(record_data, thread_id)
+
+    async def send_embeds(self, embeds, thread_id=None):
+        await asyncio.sleep(self.post_seconds)
+        self.messages.append(len(embeds))
+        return True
+
+
+def run_webhook(monkeypatch, notifier, requests_to_send):
+    """ Serves the webhook with the given notifier and sends the requests in order, returning the responses.
+        A number in place of a request waits that many seconds.
+    """
+
+    monkeypatch.setattr(app_discord_bot, 'get_record_notifier', lambda: notifier)
+
+    async def scenario():
+        delivery_queue = app_discord_bot.RecordDeliveryQueue()
+        delivery_queue.task = asyncio.create_task(delivery_queue.run())
+        client = TestClient(TestServer(app_discord_bot.create_app(FakeBot(), delivery_queue)))
+        await client.start_server()
+        try:
+            responses = []
+            for request in requests_to_send:
+                if isinstance(request, (int, float)):
+                    await asyncio.sleep(request)
+                    continue
+                path, body, headers = request
+                response = await client.post(path, json=body, headers=headers)
+                responses.append((response.status, await response.json()))
+            # Lets deliveries still running after a timeout finish
+            await asyncio.sleep(notifier.post_seconds + notifier.coalesce_seconds + 0.1)
+            return responses
+        finally:
+            delivery_queue.task.cancel()
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+def batch(*record_ids):
+    return {'records': [{'id': record_id, 'record': {'username': f'runner{record_id}'}} for record_id in record_ids]}
+
+
+def test_batch_is_posted_in_shared_messages(monkeypatch):
+    monkeypatch.setattr(app_discord_bot, 'WEBHOOK_DELIVERY_TIMEOUT', 2)
+    notifier = SlowNotifier(post_seconds=0)
+
+    [(status, body)] = run_webhook(monkeypatch, notifier, [('/webhook/new-records', batch(*range(1, 13)), None)])
+
+    assert status == 200
+    assert body['results'] == {str(record_id): 'posted' for record_id in range(1, 13)}
+    assert notifier.messages == [10, 2]
+
+
+def test_batch_sent_again_after_a_timeout_is_not_posted_twice(monkeypatch):
+    monkeypatch.setattr(app_discord_bot, 'WEBHOOK_DELIVERY_TIMEOUT', 0.1)
+    notifier = SlowNotifier(post_seconds=0.3)
+
+    request = ('/webhook/new-records', batch(1, 2), None)
+    responses = run_webhook(monkeypatch, notifier, [request, request, 0.5, request])
+
+    assert [body['results'] for _, body in responses] == [{'1': 'pending', '2': 'pending'}] * 2 + \
+           [{'1': 'posted', '2': 'posted'}]
+    assert notifier.messages == [2]
+
+
+def test_single_record_sent_again_with_its_key_after_a_504_is_not_posted_twice(monkeypatch):
+    monkeypatch.setattr(app_discord_bot, 'WEBHOOK_DELIVERY_TIMEOUT', 0.1)
+    notifier = SlowNotifier(post_seconds=0.3)
+    record = ('/webhook/new-record', {'username': 'runner'}, {'Idempotency-Key': '7'})
+
+    responses = run_webhook(monkeypatch, notifier, [record, record])
+
+    assert [status for status, _ in responses] == [504, 504]
+    assert notifier.messages == [1]
+
+
+class FakeThread(discord.Thread):
+    """ Forum thread recording the number of embeds of every message, failing the first failures sends. """
+
+    def __init__(self, failures=0):
+        self.name = 'records'
+        self.failures = failures
+        self.messages = []
+
+    async def send(self, embeds):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('Discord is unavailable')
+        self.messages.append(len(embeds))
+
+
+class FakeForumChannel(discord.ForumChannel):
+    def __init__(self):
+        pass
+
+
+class FakeChannelBot(FakeBot):
+    def __init__(self, thread):
+        self.thread = thread
+        self.forum = FakeForumChannel()
+
+    def get_channel(self, channel_id):
+        return self.thread if channel_id == 1 else self.forum
+
+
+class FakeThreadNotifier(RecordNotifier):
+    """ RecordNotifier posting to a fake forum thread through its real send_embeds. """
+
+    post_seconds = 0
+
+    def __init__(self, thread, coalesce_seconds=0.05):
+        super().__init__(FakeChannelBot(thread), coalesce_seconds=coalesce_seconds)
+
+    def queue_record(self, record_data, thread_id=1):
+        return super().queue_record(record_data, thread_id)
+
+
+@pytest.mark.parametrize('records', [1, 10, 11, 23])
+def test_queued_records_share_messages_of_up_to_ten_embeds(records):
+    thread = FakeThread()
+    notifier = FakeThreadNotifier(thread)
+
+    async def scenario():
+        futures = [notifier.queue_record({'username': f'runner{number}'}) for number in range(records)]
+        return await asyncio.gather(*futures)
+
+    assert asyncio.run(scenario()) == [True] * records
+    assert len(thread.messages) == math.ceil(records / 10)
+    assert sum(thread.messages) == records
+    assert all(embeds <= 10 for embeds in thread.messages)
+
+
+def test_records_of_a_failed_send_are_posted_when_sent_again(monkeypatch):
+    monkeypatch.setattr(app_discord_bot, 'WEBHOOK_DELIVERY_TIMEOUT', 2)
+    thread = FakeThread(failures=1)
+    notifier = FakeThreadNotifier(thread)
+
+    request = ('/webhook/new-records', batch(1, 2, 3), None)
+    responses = run_webhook(monkeypatch, notifier, [request, request])
+
+    assert [body['results'] for _, body in responses] == [{'1': 'failed', '2': 'failed', '3': 'failed'},
+                                                          {'1': 'posted', '2': 'posted', '3': 'posted'}]
+    assert thread.messages == [3]
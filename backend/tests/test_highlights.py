@@ -0,0 +1,58 @@
+from models import HighlightSnapshot, Submission
+from session import create_session
+import routes.helpers as helpers
+
+
+def highlight(session, submission):
+    session.query(Submission).filter(Submission.id == submission.id).update({Submission.highlighted: True})
+    helpers.build_highlight_snapshot(session)
+    session.commit()
+
+
+def test_first_read_builds_the_snapshot_and_later_reads_skip_submissions(client, count_queries, make_user,
+                                                                        make_submission, session):
+    make_submission(make_user('runner'), 1000, highlighted=True)
+
+    first = client.get('/api/submission/highlights')
+    assert [run['user'] for run in first.get_json()['data']] == ['runner']
+
+    with count_queries() as statements:
+        second = client.get('/api/submission/highlights')
+
+    assert second.get_json()['data'] == first.get_json()['data']
+    assert len(statements) == 1
+    assert 'highlight_snapshot' in statements[0]
+
+
+def test_snapshot_created_by_another_worker_is_updated_instead_of_failing(monkeypatch, session):
+    # Another worker inserts the row between this worker's lookup and its insert
+    other_worker = create_session()
+    helpers.build_highlight_snapshot(other_worker)
+    other_worker.commit()
+    other_worker.close()
+
+    real_get = session.get
+    lookups = []
+
+    def racing_get(entity, ident, **kwargs):
+        lookups.append(ident)
+        if len(lookups) == 1:
+            return None
+        return real_get(entity, ident, **kwargs)
+
+    monkeypatch.setattr(session, 'get', racing_get)
+    helpers.build_highlight_snapshot(session)
+    session.commit()
+
+    assert session.query(HighlightSnapshot.version).scalar() == 2
+
+
+def test_snapshot_follows_the_rank_of_a_beaten_highlight(client, session, make_user, make_submission):
+    record = make_submission(make_user('runner'), 2000)
+    highlight(session, record)
+    assert [run['rank'] for run in client.get('/api/submission/highlights').get_json()['data']] == [1]
+
+    make_submission(make_user('faster'), 1000)
+
+    highlights = client.get('/api/submission/highlights').get_json()['data']
+    assert [(run['user'], run['rank'], run['points']) for run in highlights] == [('runner', 2, 1)]
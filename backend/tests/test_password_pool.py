@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+import models
+import routes.auth_routes as auth_routes
+import routes.mod_routes as mod_routes
+from models import User
+from password_pool import PasswordPool
+
+
+@pytest.fixture
+def fill_password_pool(monkeypatch):
+    """ Swaps in a password pool with one worker and no queue and returns a function keeping it busy until the test
+        ends, so every further login is rejected.
+    """
+
+    pool = PasswordPool(workers=1, queue_limit=0)
+    monkeypatch.setattr(auth_routes, 'password_pool', pool)
+    monkeypatch.setattr(mod_routes, 'password_pool', pool)
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold_the_worker():
+        started.set()
+        release.wait()
+
+    busy = threading.Thread(target=pool.run, args=(hold_the_worker,))
+
+    def fill():
+        busy.start()
+        started.wait()
+        return pool
+
+    yield fill
+
+    release.set()
+    if busy.is_alive():
+        busy.join()
+
+
+def test_login_is_rejected_with_a_json_429_when_the_pool_is_full(client, make_user, fill_password_pool):
+    make_user('runner')
+    pool = fill_password_pool()
+
+    response = client.post('/api/tokens/create', auth=('runner', 'password'))
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    body = response.get_json()
+    assert (body['success'], body['status_code']) == (False, 429)
+    assert pool.stats()['rejected'] == 1
+
+
+def test_mods_can_read_the_rejected_login_count(client, make_user, login, fill_password_pool):
+    make_user('mod', role=2)
+    make_user('runner')
+    mod_token, _ = login('mod')
+    runner_token, _ = login('runner')
+
+    fill_password_pool()
+    assert client.post('/api/tokens/create', auth=('runner', 'password')).status_code == 429
+
+    response = client.get('/api/mod/stats', headers={'Authorization': f'Bearer {mod_token}'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['password_pool'] == {'workers': 1, 'queue_limit': 0, 'rejected': 1}
+
+    assert client.get('/api/mod/stats', headers={'Authorization': f'Bearer {runner_token}'}).status_code == 403
+
+
+def test_password_is_rehashed_on_login_when_the_cost_changes(client, session, monkeypatch, make_user):
+    runner = make_user('runner')
+    assert runner.password.split('$')[2] == f'{models.BCRYPT_ROUNDS:02d}'
+
+    monkeypatch.setattr(models, 'BCRYPT_ROUNDS', models.BCRYPT_ROUNDS + 1)
+    assert client.post('/api/tokens/create', auth=('runner', 'password')).status_code == 200
+
+    session.expire_all()
+    password_hash = session.get(User, runner.id).password
+    assert password_hash.split('$')[2] == f'{models.BCRYPT_ROUNDS:02d}'
+    assert client.post('/api/tokens/create', auth=('runner', 'password')).status_code == 200
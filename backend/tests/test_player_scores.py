@@ -0,0 +1,81 @@
+import datetime
+import random
+
+import pytest
+
+import routes.helpers as helpers
+from models import Submission, TimeframeScore, User
+
+BOARDS = [(category, chapter, sub_chapter) for category in ('any%', 'inbounds')
+          for chapter in ('chapter1', 'chapter2') for sub_chapter in ('sub1', 'sub2')]
+
+
+def submit_run(session, generator, users):
+    """ The helper calls of create_submission: the runner's previous runs on the board are voided. """
+
+    user = generator.choice(users)
+    category, chapter, sub_chapter = generator.choice(BOARDS)
+    session.query(Submission) \
+        .filter(Submission.category == category, Submission.chapter == chapter, Submission.sub_chapter == sub_chapter,
+                Submission.user_id == user.id) \
+        .update({Submission.voided: True})
+    session.add(Submission(user_id=user.id, category=category, chapter=chapter, sub_chapter=sub_chapter,
+                           time_complete=generator.randint(1000, 1020), game_title='itt',
+                           video_url='https://example.com/run', voided=False, reported=False, highlighted=False,
+                           date=datetime.datetime.now() - datetime.timedelta(days=generator.randint(0, 40) + 0.5)))
+
+    helpers.update_submission_rankings(session, category, chapter, sub_chapter, commit=False)
+    helpers.update_player_scores(session, category, chapter, sub_chapter)
+
+
+def edit_run(session, generator, users):
+    """ The helper calls of edit_submission, with a new time for a random run. """
+
+    submission = generator.choice(session.query(Submission).filter(Submission.voided == False).all())
+    submission.time_complete = generator.randint(1000, 1020)
+    session.commit()
+
+    board = (submission.category, submission.chapter, submission.sub_chapter)
+    helpers.update_submission_rankings(session, *board)
+    helpers.update_player_scores(session, *board)
+
+
+def remove_run(session, generator, users):
+    """ The helper calls of remove_submission, which also rescores the owner of the removed run. """
+
+    submission = generator.choice(session.query(Submission).all())
+    board = (submission.category, submission.chapter, submission.sub_chapter)
+    owner_id = submission.user_id
+    session.delete(submission)
+    session.commit()
+
+    helpers.update_submission_rankings(session, *board)
+    helpers.update_player_scores(session, *board, user_ids=[owner_id])
+
+
+def stored_scores(session):
+    """ Users' scores and non-zero timeframe scores. A missing timeframe row and a zero score rank the same. """
+
+    session.expire_all()
+    user_scores = dict(session.query(User.id, User.score))
+    timeframe_scores = {(row.user_id, row.category, row.time_frame): row.score
+                        for row in session.query(TimeframeScore) if row.score}
+    return user_scores, timeframe_scores
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_scores_match_a_full_recompute(session, make_user, seed):
+    generator = random.Random(seed)
+    users = [make_user(f'runner{number}') for number in range(6)]
+
+    for _ in range(60):
+        has_runs = session.query(Submission.id).first() is not None
+        operation = generator.choice([submit_run, submit_run, edit_run, remove_run]) if has_runs else submit_run
+        operation(session, generator, users)
+
+    incremental = stored_scores(session)
+    assert any(incremental[0].values())
+
+    helpers.update_player_scores(session)
+
+    assert stored_scores(session) == incremental
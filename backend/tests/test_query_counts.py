@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import routes.league_routes as league_routes
+from models import Badge
+from response_cache import response_cache
+from season_registry import SeasonRegistry
+
+
+def test_profile_query_count_does_not_grow_with_the_profile(client, session, count_queries, make_user,
+                                                           make_submission, make_league_run):
+    query_counts = []
+
+    for runs in (1, 8):
+        runner = make_user(f'runner{runs}')
+        for number in range(runs):
+            make_submission(runner, 1000 + number, sub_chapter=f'sub{number}')
+            make_league_run(runner, '1_su_25', week=number + 1, level=1, time_complete=1000)
+            runner.badges.append(Badge(name=f'badge{number}', viewable=True, url='badge.png'))
+        session.commit()
+
+        response_cache.clear()
+        with count_queries() as statements:
+            response = client.get(f'/api/profile/runner{runs}')
+
+        assert response.status_code == 200
+        assert len(response.get_json()['data']['submissions']) == runs
+        query_counts.append(len(statements))
+
+    # The user, their submissions, league runs and badges, and the rank count
+    assert query_counts == [5, 5]
+
+
+@pytest.fixture
+def league_season(tmp_path, monkeypatch):
+    """ Swaps the season registry for one serving a single season with the given number of weeks and levels. """
+
+    def make(weeks, levels):
+        season_dir = tmp_path / f'{weeks}_season{weeks}'
+        season_dir.mkdir()
+        button_data = {f'week_{week}': {'levels': {str(level): {'name': f'Level {level}'}
+                                                   for level in range(1, levels + 1)}}
+                       for week in range(1, weeks + 1)}
+        (season_dir / 'button_data.json').write_text(json.dumps(button_data))
+
+        registry = SeasonRegistry(str(tmp_path))
+        registry.refresh()
+        monkeypatch.setattr(league_routes, 'season_registry', registry)
+        return season_dir.name
+
+    return make
+
+
+def test_buttons_query_count_does_not_grow_with_the_weeks_and_levels(client, count_queries, make_user,
+                                                                     make_league_run, league_season):
+    query_counts = []
+
+    for size in (1, 6):
+        season = league_season(weeks=size, levels=size)
+        for week in range(1, size + 1):
+            for level in range(1, size + 1):
+                for place in range(4):
+                    make_league_run(make_user(f'runner{size}-{week}-{level}-{place}'), season, week, level,
+                                    1000 + place)
+
+        with count_queries() as statements:
+            response = client.get(f'/api/leagues/buttons/{season}')
+
+        assert response.status_code == 200
+        players = response.get_json()['data'][f'week_{size}']['levels'][str(size)]['players']
+        assert len(players) == 3
+        query_counts.append(len(statements))
+
+    # Change counters for the ETag and for the cached top runs, then the windowed top runs query
+    assert query_counts == [3, 3]
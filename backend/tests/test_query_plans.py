@@ -0,0 +1,110 @@
+import contextlib
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+import highlight_scheduler
+import routes.helpers as helpers
+from models import HighlightSnapshot
+from token_cache import token_cache
+
+
+@pytest.fixture
+def capture_queries(engine):
+    """ Context manager collecting the (statement, parameters) of the SELECTs run on the engine while it is open. """
+
+    @contextlib.contextmanager
+    def capture():
+        queries = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                queries.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield queries
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return capture
+
+
+def plan_indexes(engine, queries, table):
+    """ Names of the indexes SQLite plans to use for the captured queries reading from table. """
+
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in queries:
+            if f'FROM {table}' not in statement:
+                continue
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            plans.extend(row[-1] for row in rows)
+
+    return ' '.join(plans)
+
+
+@pytest.fixture
+def seeded(make_user, make_submission, make_league_run):
+    for number in range(3):
+        runner = make_user(f'runner{number}')
+        make_submission(runner, 1000 + number)
+        make_submission(runner, 1000 + number, sub_chapter='other')
+        make_league_run(runner, '1_su_25', week=1, level=1, time_complete=1000 + number)
+
+
+def test_board_query_uses_the_board_index(client, engine, capture_queries, seeded):
+    with capture_queries() as queries:
+        assert client.get('/api/leaderboard/itt/any/chapter/sub').status_code == 200
+
+    assert 'ix_submission_board' in plan_indexes(engine, queries, 'submission')
+
+
+def test_profile_submissions_use_the_user_index(client, engine, capture_queries, seeded):
+    with capture_queries() as queries:
+        assert client.get('/api/profile/runner0').status_code == 200
+
+    assert 'ix_submission_user_id' in plan_indexes(engine, queries, 'submission')
+
+
+def test_user_leaderboard_reads_the_board_in_index_order(client, engine, session, capture_queries, seeded):
+    helpers.update_player_scores(session)
+
+    with capture_queries() as queries:
+        assert client.get('/api/leaderboard/users/any/weekly').status_code == 200
+
+    plan = plan_indexes(engine, queries, 'timeframe_score')
+    assert 'ix_timeframe_score_board' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_access_tokens_are_looked_up_by_their_digest_index(client, engine, capture_queries, make_user, login):
+    make_user('runner')
+    access_token, _ = login('runner')
+    token_cache.clear()
+
+    with capture_queries() as queries:
+        assert client.get('/api/me', headers={'Authorization': f'Bearer {access_token}'}).status_code == 200
+
+    assert 'ix_token_access_token' in plan_indexes(engine, queries, 'token')
+
+
+def test_highlight_rotation_uses_the_rank_index(session, engine, capture_queries, seeded):
+    helpers.build_highlight_snapshot(session, rotated=True)
+    session.query(HighlightSnapshot).update(
+        {HighlightSnapshot.rotated_at: highlight_scheduler.last_scheduled_rotation() - datetime.timedelta(days=1)})
+    session.commit()
+
+    with capture_queries() as queries:
+        assert highlight_scheduler.rotate_highlights_if_due(session)
+
+    assert 'ix_submission_rank_voided' in plan_indexes(engine, queries, 'submission')
+
+
+def test_league_queries_use_the_league_board_index(client, engine, capture_queries, seeded):
+    with capture_queries() as queries:
+        assert client.get('/api/leagues/1_su_25/1/1').status_code == 200
+        assert client.get('/api/leagues/buttons/1_su_25').status_code == 200
+
+    assert 'ix_league_run_board' in plan_indexes(engine, queries, 'league_run')
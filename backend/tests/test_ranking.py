@@ -0,0 +1,90 @@
+import os
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.orm import Session
+
+import routes.helpers as helpers
+from models import Base, Submission
+
+# Scratch databases the differential test may create and drop the tables in, SQLite runs in memory
+DATABASE_URL_SETTINGS = [None, 'TEST_POSTGRES_URL', 'TEST_MYSQL_URL']
+
+
+@pytest.fixture(params=DATABASE_URL_SETTINGS)
+def ranking_engine(request):
+    url = os.getenv(request.param) if request.param else 'sqlite://'
+    if not url:
+        pytest.skip(f"{request.param} is not configured")
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def ranks(session):
+    return [(submission_id, rank) for submission_id, rank in
+            session.query(Submission.id, Submission.rank).order_by(Submission.id)]
+
+
+def test_set_based_ranking_matches_python_ranking(ranking_engine):
+    generator = random.Random(3)
+
+    with Session(ranking_engine) as session:
+        for _ in range(50):
+            session.query(Submission).delete()
+
+            # Few distinct times so most boards have ties, some voided runs and a run on another board
+            for _ in range(generator.randint(0, 25)):
+                session.add(Submission(category='any%', chapter='chapter', sub_chapter='sub',
+                                       time_complete=generator.randint(1, 6), voided=generator.random() < 0.2,
+                                       rank=generator.choice([None, 1, 2])))
+            session.add(Submission(category='any%', chapter='chapter', sub_chapter='other', time_complete=1,
+                                   voided=False, rank=99))
+            session.commit()
+            initial = [(submission.id, submission.rank) for submission in session.query(Submission)]
+
+            python_total = helpers._rank_submissions_python(session, 'any%', 'chapter', 'sub')
+            session.commit()
+            python_ranks = ranks(session)
+
+            for submission_id, rank in initial:
+                session.query(Submission).filter(Submission.id == submission_id).update({Submission.rank: rank})
+            session.commit()
+
+            set_based_total = helpers._rank_submissions_set_based(session, 'any%', 'chapter', 'sub')
+            session.commit()
+
+            assert ranks(session) == python_ranks
+            assert set_based_total == python_total
+
+
+@pytest.mark.parametrize('dialect, expected', [
+    (postgresql.dialect(), 'UPDATE submission SET rank=anon_1.rank FROM (SELECT'),
+    (mysql.dialect(), 'UPDATE submission, (SELECT'),
+])
+def test_ranking_update_compiles_for_set_based_dialects(dialect, expected):
+    assert dialect.name in helpers.SET_BASED_RANKING_DIALECTS
+
+    statement = str(helpers._board_ranking_update('any%', 'chapter', 'sub').compile(dialect=dialect))
+
+    assert statement.startswith(expected)
+    assert 'rank() OVER (ORDER BY submission.time_complete ASC)' in statement
+
+
+def test_profile_rank_is_one_more_than_the_users_with_a_higher_score(client, session, count_queries,
+                                                                          make_user):
+    for username, score in (('first', 900), ('tied1', 500), ('tied2', 500), ('after_tie', 300), ('unscored', None)):
+        make_user(username).score = score
+    session.commit()
+
+    with count_queries() as statements:
+        profile_ranks = {username: client.get(f'/api/profile/{username}').get_json()['data']['rank']
+                         for username in ('first', 'tied1', 'tied2', 'after_tie', 'unscored')}
+
+    assert profile_ranks == {'first': 1, 'tied1': 2, 'tied2': 2, 'after_tie': 4, 'unscored': 5}
+    assert len([statement for statement in statements if 'count(' in statement.lower()]) == 5
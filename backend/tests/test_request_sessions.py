@@ -0,0 +1,55 @@
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from token_cache import token_cache
+
+
+@pytest.fixture
+def count_checkouts(engine):
+    """ Context manager counting the connections checked out of the pool while it is open. """
+
+    @contextlib.contextmanager
+    def counter():
+        checkouts = []
+
+        def record(dbapi_connection, connection_record, connection_proxy):
+            checkouts.append(connection_record)
+
+        event.listen(engine.pool, 'checkout', record)
+        try:
+            yield checkouts
+        finally:
+            event.remove(engine.pool, 'checkout', record)
+
+    return counter
+
+
+def test_login_checks_out_one_connection(client, count_checkouts, make_user):
+    make_user('runner')
+
+    with count_checkouts() as checkouts:
+        response = client.post('/api/tokens/create', auth=('runner', 'password'))
+
+    assert response.status_code == 200
+    assert len(checkouts) == 1
+
+
+def test_me_checks_out_one_connection(client, count_checkouts, make_user, login):
+    make_user('runner')
+    access_token, _ = login('runner')
+    token_cache.clear()
+
+    with count_checkouts() as checkouts:
+        response = client.get('/api/me', headers={'Authorization': f'Bearer {access_token}'})
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['username'] == 'runner'
+    assert len(checkouts) == 1
+
+    # The cached token is served without the database
+    with count_checkouts() as checkouts:
+        assert client.get('/api/me', headers={'Authorization': f'Bearer {access_token}'}).status_code == 200
+
+    assert checkouts == []
@@ -0,0 +1,68 @@
+from response_cache import response_cache
+from routes.helpers import bump_versions, board_version_name
+
+
+def test_cached_leaderboard_is_rebuilt_after_a_write_on_another_worker(client, session, make_user, make_submission):
+    runner = make_user('runner')
+    make_submission(runner, 1000)
+    make_submission(make_user('runner2'), 2000)
+
+    url = '/api/leaderboard/itt/any/chapter/sub'
+    first = client.get(url)
+    assert len(first.get_json()['data']) == 2
+
+    # A run added by another worker bumps the shared counter but can't clear this worker's cache
+    make_submission(make_user('runner3'), 3000, rank_board=False)
+    bump_versions(session, board_version_name('any%', 'chapter', 'sub'))
+    session.commit()
+
+    second = client.get(url)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert len(second.get_json()['data']) == 3
+
+    assert client.get(url, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+
+def test_recent_runs_revalidate_after_a_report_and_a_restore(client, make_user, make_submission, login):
+    runner = make_user('runner')
+    submission = make_submission(runner, 1000)
+    make_user('mod', role=2)
+    mod_token, _ = login('mod')
+    headers = {'Authorization': f'Bearer {mod_token}'}
+
+    url = '/api/leaderboard/recent_runs'
+    before = client.get(url)
+    assert before.get_json()['data'][0]['reported'] is False
+
+    response = client.post('/api/submission/report', headers=headers,
+                           json={'run_id': submission.id, 'message': 'spliced video'})
+    assert response.status_code == 200
+
+    reported = client.get(url, headers={'If-None-Match': before.headers['ETag']})
+    assert reported.status_code == 200
+    assert reported.get_json()['data'][0]['reported'] is True
+
+    assert client.post('/api/submission/restore', headers=headers, json={'id': submission.id}).status_code == 200
+
+    restored = client.get(url, headers={'If-None-Match': reported.headers['ETag']})
+    assert restored.status_code == 200
+    assert restored.get_json()['data'][0]['reported'] is False
+
+
+def test_mods_can_read_the_response_cache_counters(client, make_user, login):
+    make_user('mod', role=2)
+    mod_token, _ = login('mod')
+    headers = {'Authorization': f'Bearer {mod_token}'}
+
+    def counters():
+        response = client.get('/api/mod/stats', headers=headers)
+        assert response.status_code == 200
+        return response.get_json()['data']['response_cache']
+
+    before = counters()
+    client.get('/api/leaderboard/recent_runs')
+    client.get('/api/leaderboard/recent_runs')
+    response_cache.invalidate('recent_runs')
+    after = counters()
+
+    assert {name: after[name] - before[name] for name in after} == {'hits': 1, 'misses': 1, 'invalidations': 1}
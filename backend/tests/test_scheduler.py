@@ -0,0 +1,68 @@
+import datetime
+
+import pytz
+
+import highlight_scheduler
+import routes.helpers as helpers
+from models import HighlightSnapshot, SchedulerLease, Submission
+
+
+def test_last_scheduled_rotation_is_the_previous_day_before_the_rotation_time():
+    eastern = pytz.timezone('US/Eastern')
+
+    before = highlight_scheduler.last_scheduled_rotation(eastern.localize(datetime.datetime(2026, 10, 18, 12, 58)))
+    after = highlight_scheduler.last_scheduled_rotation(eastern.localize(datetime.datetime(2026, 10, 18, 13, 0)))
+
+    def local(eastern_time):
+        return eastern.localize(eastern_time).astimezone().replace(tzinfo=None)
+
+    assert before == local(datetime.datetime(2026, 10, 17, 12, 59))
+    assert after == local(datetime.datetime(2026, 10, 18, 12, 59))
+
+
+def record_missed_rotation(session):
+    """ Records the last rotation a day before the last scheduled one and returns its time. """
+
+    helpers.build_highlight_snapshot(session, rotated=True)
+    missed = highlight_scheduler.last_scheduled_rotation() - datetime.timedelta(days=1)
+    session.query(HighlightSnapshot).update({HighlightSnapshot.rotated_at: missed})
+    session.commit()
+    return missed
+
+
+def test_first_run_records_the_last_scheduled_rotation_without_rotating(session, make_user, make_submission):
+    make_submission(make_user('runner'), 1000)
+
+    assert not highlight_scheduler.rotate_highlights_if_due(session)
+
+    assert not session.query(Submission.highlighted).scalar()
+    assert session.query(HighlightSnapshot.rotated_at).scalar() == highlight_scheduler.last_scheduled_rotation()
+    assert not highlight_scheduler.rotate_highlights_if_due(session)
+
+
+def test_rotation_runs_once_per_scheduled_time(session, make_user, make_submission):
+    make_submission(make_user('runner'), 1000)
+    record_missed_rotation(session)
+
+    assert highlight_scheduler.rotate_highlights_if_due(session)
+    assert not highlight_scheduler.rotate_highlights_if_due(session)
+
+    assert session.query(Submission.highlighted).scalar()
+    assert session.query(HighlightSnapshot.rotated_at).scalar() >= highlight_scheduler.last_scheduled_rotation()
+
+
+def test_new_leader_runs_the_rotation_its_predecessor_missed(session, make_user, make_submission):
+    make_submission(make_user('runner'), 1000)
+
+    # The previous leader rotated a day before the last scheduled rotation and died before the next one
+    missed = record_missed_rotation(session)
+    session.add(SchedulerLease(name=highlight_scheduler.SCHEDULER_LEASE_NAME, holder='dead-worker',
+                               expires_at=datetime.datetime.now() - datetime.timedelta(seconds=1)))
+    session.commit()
+
+    highlight_scheduler.refresh_timeframe_scores()
+
+    session.expire_all()
+    assert session.get(SchedulerLease, highlight_scheduler.SCHEDULER_LEASE_NAME).holder != 'dead-worker'
+    assert session.query(HighlightSnapshot.rotated_at).scalar() > missed
+    assert session.query(Submission.highlighted).scalar()
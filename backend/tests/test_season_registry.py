@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+import routes.league_routes as league_routes
+from season_registry import SeasonRegistry
+
+
+def write_results(season_dir, winner):
+    results_file = season_dir / 'bracket_results.json'
+    results_file.write_text(json.dumps({'data': {'winner': winner}}))
+    return results_file
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """ A registry re-checking on every read over two seasons, 1_su_25 with bracket results and 2_fa_25 without,
+        swapped in for the league routes.
+    """
+
+    for directory in ('2_fa_25', '1_su_25', 'notes'):
+        (tmp_path / directory).mkdir()
+    write_results(tmp_path / '1_su_25', 'runner1')
+
+    season_registry = SeasonRegistry(str(tmp_path), refresh_interval=0)
+    monkeypatch.setattr(league_routes, 'season_registry', season_registry)
+    return season_registry
+
+
+def test_seasons_are_found_by_id_and_short_name(registry):
+    assert [season.id for season in registry.seasons()] == ['1_su_25', '2_fa_25']
+    assert registry.get('1_su_25') is registry.get('su_25')
+    assert registry.get('su_25').number == 1
+    assert registry.get('su_25').bracket_results == {'data': {'winner': 'runner1'}}
+    assert registry.get('fa_25').bracket_results is None
+    assert registry.get('notes') is None
+    assert registry.get('wi_26') is None
+
+
+def test_only_changed_files_are_reloaded(tmp_path, registry):
+    registry.refresh()
+    version = registry.version
+    registry.refresh()
+    assert registry.version == version
+
+    # Same size, so only the newer modification time tells the file changed
+    results_file = write_results(tmp_path / '1_su_25', 'runner2')
+    modified = os.stat(results_file).st_mtime_ns + 10 ** 9
+    os.utime(results_file, ns=(modified, modified))
+
+    assert registry.get('su_25').bracket_results == {'data': {'winner': 'runner2'}}
+    assert registry.version == version + 1
+
+    (tmp_path / '3_wi_26').mkdir()
+    assert registry.get('wi_26').number == 3
+    assert registry.version == version + 2
+
+
+def test_reads_within_the_refresh_interval_are_served_from_memory(tmp_path):
+    (tmp_path / '1_su_25').mkdir()
+    registry = SeasonRegistry(str(tmp_path), refresh_interval=3600)
+    registry.refresh()
+
+    (tmp_path / '2_fa_25').mkdir()
+    assert registry.get('fa_25') is None
+
+    registry.refresh()
+    assert registry.get('fa_25').id == '2_fa_25'
+
+
+def test_season_routes(client, registry):
+    for season in ('1_su_25', 'su_25'):
+        response = client.get(f'/api/leagues/{season}/results')
+        assert response.status_code == 200
+        assert response.get_json()['data'] == {'winner': 'runner1'}
+
+    assert client.get('/api/leagues/all_seasons').get_json()['data'] == ['su_25', 'fa_25']
+
+    for url in ('/api/leagues/wi_26/results', '/api/leagues/fa_25/results', '/api/leagues/buttons/wi_26'):
+        response = client.get(url)
+        assert response.status_code == 404
+        assert response.get_json()['success'] is False
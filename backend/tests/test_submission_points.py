@@ -0,0 +1,44 @@
+from sqlalchemy import event
+
+import routes.helpers as helpers
+from models import Leaderboard, Submission
+
+
+def test_voided_runs_have_no_points(session, make_user, make_submission):
+    record = make_submission(make_user('runner'), 1000)
+    second = make_submission(make_user('runner2'), 2000)
+    third = make_submission(make_user('runner3'), 3000)
+
+    session.query(Submission).filter(Submission.id.in_([second.id, third.id])).update({Submission.voided: True})
+    session.commit()
+    helpers.update_submission_rankings(session, 'any%', 'chapter', 'sub')
+
+    session.expire_all()
+    points = {submission_id: points for submission_id, points in session.query(Submission.id, Submission.points)}
+    assert points == {record.id: 1, second.id: None, third.id: None}
+
+
+def test_board_created_by_another_request_is_updated_instead_of_failing(engine, session, make_user, make_submission):
+    # Already ranked, so this request has nothing to write before it looks the board up
+    make_submission(make_user('runner'), 1000, rank_board=False, rank=1)
+
+    other_inserts = []
+
+    # Another request creates the board between this request's lookup and its insert
+    def create_board_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO leaderboard') and not other_inserts:
+            other_inserts.append(statement)
+            with engine.begin() as other_request:
+                other_request.execute(Leaderboard.__table__.insert().values(
+                    category='any%', chapter='chapter', sub_chapter='sub', total_submissions=1))
+
+    event.listen(engine, 'before_cursor_execute', create_board_first)
+    try:
+        helpers.update_submission_rankings(session, 'any%', 'chapter', 'sub')
+    finally:
+        event.remove(engine, 'before_cursor_execute', create_board_first)
+
+    assert other_inserts
+
+    assert session.query(Leaderboard.total_submissions).all() == [(1,)]
+    assert session.query(Submission.points).scalar() == 1
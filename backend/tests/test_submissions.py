@@ -0,0 +1,42 @@
+from models import DiscordOutbox, Submission
+
+
+def bearer(access_token):
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def submission_form(**fields):
+    form = {'chapter': 'Chapter', 'sub_chapter': 'Sub', 'category': 'Any%', 'video_url': 'https://example.com/run',
+            'minutes': '1', 'seconds': '02', 'milliseconds': '30', 'description': 'clean run'}
+    form.update(fields)
+    return form
+
+
+def test_create_submission_returns_the_ranked_submission(client, session, make_user, make_submission, login):
+    make_submission(make_user('record_holder'), 90000)
+    runner = make_user('runner')
+    access_token, _ = login('runner')
+
+    response = client.post('/api/submission/create', headers=bearer(access_token), json=submission_form())
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['user_id'] == runner.id
+    assert (data['category'], data['chapter'], data['sub_chapter']) == ('any%', 'chapter', 'sub')
+    assert data['time_complete'] == 62300
+    assert (data['rank'], data['points']) == (1, 2)
+    assert data['description'] == 'clean run'
+    assert data['id'] == session.query(Submission.id).filter(Submission.user_id == runner.id).scalar()
+
+    # The new record is queued for Discord in the same transaction
+    assert session.query(DiscordOutbox).count() == 1
+
+
+def test_mod_create_submission_returns_the_ranked_submission(client, make_user):
+    runner = make_user('runner')
+
+    response = client.post('/api/submission/mod/create', json=dict(submission_form(), user_id=runner.id))
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert (data['user_id'], data['time_complete'], data['rank'], data['points']) == (runner.id, 62300, 1, 1)
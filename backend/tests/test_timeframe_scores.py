@@ -0,0 +1,107 @@
+import datetime
+import random
+
+import pytest
+
+import routes.helpers as helpers
+
+CATEGORIES = ['any%', 'nmg']
+BOARDS = [(category, chapter, sub_chapter) for category in CATEGORIES
+          for chapter in ('chapter1', 'chapter2') for sub_chapter in ('sub1', 'sub2')]
+
+
+def per_user_timeframe_score(user, time_frame, category):
+    """ The score calculation the grouped query replaced, walking one user's submissions in Python. """
+
+    timeframe_total_score = 0
+
+    now = datetime.datetime.now()
+    if time_frame == 'monthly':
+        cutoff_date = now - datetime.timedelta(days=30)
+    elif time_frame == 'weekly':
+        cutoff_date = now - datetime.timedelta(days=7)
+    else:
+        cutoff_date = None
+
+    for submission in user.submissions:
+        if submission.voided:
+            continue
+
+        if category != 'main board' and submission.category != category:
+            continue
+
+        if cutoff_date and submission.date < cutoff_date:
+            continue
+
+        timeframe_total_score += submission.points
+
+    return timeframe_total_score
+
+
+@pytest.mark.parametrize('time_frame', ['all_time', 'monthly', 'weekly'])
+@pytest.mark.parametrize('category', ['main board'] + CATEGORIES)
+def test_grouped_scores_match_per_user_scores(session, make_user, make_submission, time_frame, category):
+    generator = random.Random(3)
+    users = [make_user(f'runner{number}') for number in range(6)]
+
+    for user in users[1:]:
+        for _ in range(generator.randint(0, 12)):
+            board_category, chapter, sub_chapter = generator.choice(BOARDS)
+            # Half a day off the whole days, so no run sits on a cutoff while the two calculations run
+            age = datetime.timedelta(days=generator.randint(0, 35) + 0.5)
+            make_submission(user, generator.randint(1, 5), category=board_category, chapter=chapter,
+                            sub_chapter=sub_chapter, rank_board=False, voided=generator.random() < 0.2,
+                            date=datetime.datetime.now() - age)
+
+    for board in BOARDS:
+        helpers.update_submission_rankings(session, *board)
+    session.expire_all()
+
+    scores = helpers.calculate_timeframe_scores(session, [user.id for user in users], time_frame, category)
+
+    assert scores == {user.id: per_user_timeframe_score(user, time_frame, category) for user in users}
+    assert any(scores.values())
+
+
+def test_user_leaderboard_lists_verified_users_by_score(client, session, make_user, make_submission):
+    first = make_user('first')
+    second = make_user('second')
+    tied = make_user('tied')
+    idle = make_user('idle')
+    make_user('unverified', role=0)
+    for user, time_complete in ((first, 1000), (second, 2000), (tied, 2000)):
+        make_submission(user, time_complete)
+    helpers.update_player_scores(session)
+
+    response = client.get('/api/leaderboard/users/any/all_time')
+
+    assert response.status_code == 200
+    assert [(user['username'], user['timeframe_score']) for user in response.get_json()['data']] == [
+        ('first', 3), ('second', 2), ('tied', 2), ('idle', 0)]
+    assert idle.id > tied.id
+
+
+def test_verified_user_is_listed_at_once(client, session, make_user, login):
+    make_user('mod', role=2)
+    newcomer = make_user('newcomer', role=0)
+    helpers.update_player_scores(session)
+    mod_token, _ = login('mod')
+
+    response = client.post('/api/mod/user/verify', headers={'Authorization': f'Bearer {mod_token}'},
+                           json={'id': newcomer.id})
+    assert response.status_code == 200
+
+    data = client.get('/api/leaderboard/users/any/weekly').get_json()['data']
+    assert ('newcomer', 0) in [(user['username'], user['timeframe_score']) for user in data]
+
+
+def test_full_rebuild_does_not_send_every_user_id(session, count_queries, make_user, make_submission):
+    for number in range(5):
+        make_submission(make_user(f'runner{number}'), 1000 + number)
+
+    with count_queries() as statements:
+        assert helpers.update_timeframe_scores(session)
+    session.commit()
+
+    assert statements
+    assert not [statement for statement in statements if ' IN (' in statement]
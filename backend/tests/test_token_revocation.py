@@ -0,0 +1,67 @@
+import time
+
+import routes.helpers as helpers
+from models import Token
+from token_cache import token_cache
+
+
+def bearer(access_token):
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def test_deleted_token_is_rejected_at_once(client, make_user, login):
+    make_user('runner')
+    access_token, _ = login('runner')
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 200
+
+    assert client.delete('/api/tokens/delete', headers=bearer(access_token)).status_code == 200
+
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 401
+
+
+def test_refreshed_access_token_is_rejected_at_once(client, make_user, login):
+    make_user('runner')
+    access_token, refresh_token = login('runner')
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 200
+
+    response = client.put('/api/tokens/refresh', headers=bearer(access_token), json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+    new_access_token = response.get_json()['data']['access_token']
+
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 401
+    assert client.get('/api/me', headers=bearer(new_access_token)).status_code == 200
+
+
+def test_token_deleted_by_another_worker_is_rejected_after_the_cache_ttl(client, session, monkeypatch, make_user,
+                                                                         login):
+    monkeypatch.setattr(token_cache, 'ttl', 0.2)
+    make_user('runner')
+    access_token, _ = login('runner')
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 200
+
+    # Another worker can't clear this worker's cache
+    session.query(Token).delete()
+    session.commit()
+
+    time.sleep(0.3)
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 401
+
+
+def test_score_change_only_drops_the_scored_users_cached_tokens(client, session, count_queries, make_user,
+                                                                 make_submission, login):
+    runner = make_user('runner')
+    make_user('other_runner')
+    runner_token, _ = login('runner')
+    other_token, _ = login('other_runner')
+    for access_token in (runner_token, other_token):
+        assert client.get('/api/me', headers=bearer(access_token)).status_code == 200
+
+    make_submission(runner, 1000)
+    helpers.update_player_scores(session, 'any%', 'chapter', 'sub')
+
+    with count_queries() as statements:
+        assert client.get('/api/me', headers=bearer(other_token)).status_code == 200
+    assert statements == []
+
+    response = client.get('/api/me', headers=bearer(runner_token))
+    assert response.get_json()['data']['score'] == 1
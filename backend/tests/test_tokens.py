@@ -0,0 +1,69 @@
+import datetime
+import hashlib
+
+import jwt
+
+from models import API_KEY, Token
+
+
+def bearer(access_token):
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def raw_token(encoded_token, key):
+    return jwt.decode(encoded_token, API_KEY, algorithms=['HS256'])[key]
+
+
+def test_only_sha256_digests_of_the_tokens_are_stored(client, session, make_user, login):
+    make_user('runner')
+    access_token, refresh_token = login('runner')
+    raw_access_token = raw_token(access_token, 'access_token')
+    raw_refresh_token = raw_token(refresh_token, 'refresh_token')
+
+    stored = session.query(Token).one()
+
+    assert stored.access_token == hashlib.sha256(raw_access_token.encode('utf-8')).hexdigest()
+    assert stored.refresh_token == hashlib.sha256(raw_refresh_token.encode('utf-8')).hexdigest()
+    assert raw_access_token not in (stored.access_token, stored.refresh_token)
+    assert Token.get_by_access_token(session, raw_access_token).id == stored.id
+    assert client.get('/api/me', headers=bearer(access_token)).status_code == 200
+
+    # A digest read from the database is not a usable token
+    stolen_token = jwt.encode({'access_token': stored.access_token}, API_KEY, algorithm='HS256')
+    assert client.get('/api/me', headers=bearer(stolen_token)).status_code == 401
+
+
+def add_tokens(session, user, count, refresh_expired_for):
+    """ Adds count tokens of user whose refresh token expired refresh_expired_for ago (negative for live tokens). """
+
+    refresh_expiration = datetime.datetime.now() - refresh_expired_for
+    first = session.query(Token).count()
+    session.add_all(Token(access_token=Token.hash_token(f'access{number}'),
+                          refresh_token=Token.hash_token(f'refresh{number}'), user=user.id,
+                          access_expiration=refresh_expiration, refresh_expiration=refresh_expiration)
+                    for number in range(first, first + count))
+    session.commit()
+
+
+def test_sweep_deletes_tokens_expired_over_a_day_ago_in_batches(session, count_queries, make_user):
+    runner = make_user('runner')
+    add_tokens(session, runner, 25, refresh_expired_for=datetime.timedelta(days=2))
+    add_tokens(session, runner, 3, refresh_expired_for=datetime.timedelta(hours=12))
+    add_tokens(session, runner, 2, refresh_expired_for=-datetime.timedelta(days=7))
+
+    with count_queries() as statements:
+        assert Token.clear_old_tokens(session, batch_size=10) == 25
+
+    assert len([statement for statement in statements if statement.startswith('DELETE')]) == 3
+    assert session.query(Token).count() == 5
+
+
+def test_login_leaves_expired_tokens_to_the_sweeper(client, session, count_queries, make_user):
+    runner = make_user('runner')
+    add_tokens(session, runner, 5, refresh_expired_for=datetime.timedelta(days=2))
+
+    with count_queries() as statements:
+        assert client.post('/api/tokens/create', auth=('runner', 'password')).status_code == 200
+
+    assert not [statement for statement in statements if statement.startswith('DELETE')]
+    assert session.query(Token).count() == 6
@@ -0,0 +1,74 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from response_cache import LRUCacheBackend
+from models import User
+import datetime
+import os
+import threading
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '30'))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '4096'))
+
+
+class TokenCache:
+    """ Maps decoded access tokens to a snapshot of their user's columns so token_auth_verify can skip the database.
+        Entries never outlive the token's access_expiration. Each worker has its own cache: deleting or refreshing a
+        token, or editing a user, drops it in the worker handling that request, other workers drop it within ttl seconds.
+    """
+
+    def __init__(self, max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL):
+        self.ttl = ttl
+        self.backend = LRUCacheBackend(max_entries=max_entries, ttl=ttl)
+        self._user_columns = [attr.key for attr in inspect(User).column_attrs]
+        # Bumped by invalidate_users, entries cached under an older generation of their user are stale
+        self._user_generations = {}
+        self._generations_lock = threading.Lock()
+
+    def user_generation(self, user_id):
+        """ Generation to pass to set_user for a user about to be read from the database. Read it before the user, so
+            an invalidation landing between the read and set_user still drops the entry.
+        """
+
+        return self._user_generations.get(user_id, 0)
+
+    def get_user(self, access_token):
+        """ User of a cached access token as a detached object, like the ones token_auth used to return after closing
+            its session, or None when the token isn't cached.
+        """
+
+        entry = self.backend.get(access_token)
+        if entry is None:
+            return None
+
+        access_expiration, generation, user_values = entry
+        if access_expiration <= datetime.datetime.now() or generation != self.user_generation(user_values['id']):
+            self.backend.delete(access_token)
+            return None
+
+        user = User(**user_values)
+        make_transient_to_detached(user)
+        return user
+
+    def set_user(self, access_token, access_expiration, user, generation):
+        seconds_left = (access_expiration - datetime.datetime.now()).total_seconds()
+        if seconds_left <= 0:
+            return
+
+        user_values = {key: getattr(user, key) for key in self._user_columns}
+        self.backend.set(access_token, (access_expiration, generation, user_values), ttl=min(self.ttl, seconds_left))
+
+    def invalidate(self, access_token):
+        self.backend.delete(access_token)
+
+    def invalidate_users(self, user_ids):
+        """ Drops the cached tokens of the given users, called whenever their columns change. """
+
+        with self._generations_lock:
+            for user_id in user_ids:
+                self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+
+    def clear(self):
+        self.backend.clear()
+
+
+token_cache = TokenCache()